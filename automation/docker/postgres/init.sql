@@ -30,6 +30,9 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     message    TEXT NOT NULL
 );
 
+-- Index for per-case audit trail lookups (WHERE case_id = ... ORDER BY timestamp)
+CREATE INDEX IF NOT EXISTS idx_audit_logs_case_id_ts ON audit_logs(case_id, timestamp);
+
 -- Memory system: Store learned patterns from HITL corrections
 CREATE TABLE IF NOT EXISTS case_resolutions (
     id               SERIAL PRIMARY KEY,
@@ -39,14 +42,28 @@ CREATE TABLE IF NOT EXISTS case_resolutions (
     frequency        INTEGER DEFAULT 1,
     created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     last_used_at     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    pattern_length   INTEGER GENERATED ALWAYS AS (length(original_pattern)) STORED,
     UNIQUE(original_pattern, resolution_type)
 );
 
 -- Index for fast pattern lookups
 CREATE INDEX IF NOT EXISTS idx_case_resolutions_pattern ON case_resolutions(original_pattern);
 CREATE INDEX IF NOT EXISTS idx_case_resolutions_type ON case_resolutions(resolution_type);
+-- Longest-first pattern scan for learned corrections
+CREATE INDEX IF NOT EXISTS idx_case_resolutions_len_freq ON case_resolutions(pattern_length DESC, frequency DESC);
+-- Case-insensitive exact lookups (lookup_similar_resolution) and wildcard ILIKE
+CREATE INDEX IF NOT EXISTS idx_case_resolutions_pattern_lower ON case_resolutions(lower(original_pattern), resolution_type);
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_case_resolutions_pattern_trgm ON case_resolutions USING gin (original_pattern gin_trgm_ops);
 
 -- NO SEED DATA: System learns everything from HITL corrections
 -- When admin corrects an address, the diff is automatically stored here
 -- Next time a similar pattern appears, it will be auto-corrected without HITL
 
+-- Cache of GPT document classifications, keyed by a hash of the OCR text + model
+CREATE TABLE IF NOT EXISTS classification_cache (
+    text_hash    TEXT PRIMARY KEY,
+    model        TEXT NOT NULL,
+    result_json  JSONB NOT NULL,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
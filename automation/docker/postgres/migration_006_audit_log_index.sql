@@ -0,0 +1,6 @@
+-- Migration 006: Index audit log lookups by case
+-- get_audit_entries filters on case_id and orders by timestamp; a composite
+-- index turns that seq scan + sort into a single ordered index scan.
+-- (cases.case_id needs no extra index: its UNIQUE constraint already creates one.)
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_case_id_ts ON audit_logs(case_id, timestamp);
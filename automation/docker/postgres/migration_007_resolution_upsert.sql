@@ -0,0 +1,6 @@
+-- Migration 007: Unique key for case_resolutions upserts
+-- store_resolution uses INSERT ... ON CONFLICT (original_pattern, resolution_type).
+-- init.sql declares this UNIQUE constraint, but tables created via migration 002 lack it.
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_case_resolutions_pattern_type
+    ON case_resolutions(original_pattern, resolution_type);
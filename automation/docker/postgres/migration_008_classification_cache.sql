@@ -0,0 +1,10 @@
+-- Migration 008: Cache of GPT document classifications
+-- classify_document_type keys results by a hash of the OCR text + model,
+-- so re-submitted or re-validated documents skip the OpenAI call.
+
+CREATE TABLE IF NOT EXISTS classification_cache (
+    text_hash    TEXT PRIMARY KEY,               -- blake2b(model + OCR text)
+    model        TEXT NOT NULL,
+    result_json  JSONB NOT NULL,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,12 @@
+-- Migration 009: Index case-insensitive pattern lookups
+-- lookup_similar_resolution matches exact patterns with lower(original_pattern) = lower(%s),
+-- which the expression index serves; wildcard patterns still use ILIKE, served by trigrams.
+-- The (original_pattern, resolution_type) unique index comes from migration 007, and
+-- cases.case_id is already indexed by its UNIQUE constraint.
+
+CREATE INDEX IF NOT EXISTS idx_case_resolutions_pattern_lower
+    ON case_resolutions(lower(original_pattern), resolution_type);
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_case_resolutions_pattern_trgm
+    ON case_resolutions USING gin (original_pattern gin_trgm_ops);
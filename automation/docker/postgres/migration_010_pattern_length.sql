@@ -0,0 +1,9 @@
+-- Migration 010: Store pattern length for the longest-first pattern scan
+-- apply_learned_corrections loads patterns ordered longest first; a stored
+-- generated column plus a composite index replaces LENGTH() per row and the sort.
+
+ALTER TABLE case_resolutions
+    ADD COLUMN IF NOT EXISTS pattern_length INTEGER GENERATED ALWAYS AS (length(original_pattern)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_case_resolutions_len_freq
+    ON case_resolutions(pattern_length DESC, frequency DESC);
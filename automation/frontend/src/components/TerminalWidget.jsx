@@ -20,7 +20,8 @@ export default function TerminalWidget() {
         eventSource.onmessage = (event) => {
             try {
                 const data = JSON.parse(event.data);
-                addLog(data);
+                // Bursts of logs arrive batched as an array
+                (Array.isArray(data) ? data : [data]).forEach(addLog);
             } catch (e) {
                 console.error('Error parsing log:', e);
             }
@@ -131,7 +131,9 @@ function AdminDashboard() {
         eventSource.onmessage = (event) => {
             try {
                 const data = JSON.parse(event.data);
-                setAiBrainLogs(prev => [...prev.slice(-50), data]); // Keep last 50 logs
+                // Bursts of logs arrive batched as an array
+                const entries = Array.isArray(data) ? data : [data];
+                setAiBrainLogs(prev => [...prev, ...entries].slice(-51)); // Keep last 50 logs
             } catch (e) {
                 console.error('SSE parse error:', e);
             }
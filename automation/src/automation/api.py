@@ -9,7 +9,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 
 from .main import run_address_change_workflow
-from .db import get_audit_entries, get_conn
+from .db import forget_case_status, get_audit_entries, get_conn
 from .document_validator import validate_case_data
 from .ocr_service import extract_text_from_pdf
 
@@ -93,32 +93,31 @@ def get_latest_case_id() -> Optional[str]:
         return row["case_id"]
 
 
+# Columns returned for the case detail view; keep in sync with CaseDetails
+_CASE_DETAIL_COLUMNS = (
+    "case_id",
+    "citizen_name",
+    "dob",
+    "email",
+    "old_address_raw",
+    "new_address_raw",
+    "move_in_date_raw",
+    "landlord_name",
+    "canonical_address",
+    "registry_exists",
+    "status",
+    "created_at",
+    "updated_at",
+)
+_FETCH_CASE_SQL = f"SELECT {', '.join(_CASE_DETAIL_COLUMNS)} FROM cases WHERE case_id = %s;"
+
+
 def fetch_case_by_id(case_id: str) -> Optional[Dict[str, Any]]:
     """
     Fetch a full case row by human-readable case_id (e.g. "Case ID: 1").
     """
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT
-                case_id,
-                citizen_name,
-                dob,
-                email,
-                old_address_raw,
-                new_address_raw,
-                move_in_date_raw,
-                landlord_name,
-                canonical_address,
-                registry_exists,
-                status,
-                created_at,
-                updated_at
-            FROM cases
-            WHERE case_id = %s;
-            """,
-            (case_id,),
-        )
+        cur.execute(_FETCH_CASE_SQL, (case_id,))
         row = cur.fetchone()
     return row
 
@@ -230,8 +229,12 @@ async def stream_logs():
             while True:
                 # Wait for new log message
                 data = await queue.get()
+                if data is None:
+                    # Evicted by the log manager (client stopped reading)
+                    break
                 yield data
-        except asyncio.CancelledError:
+        finally:
+            # Cancelled or closed on client disconnect: stop broadcasting to this queue
             log_manager.disconnect(queue)
             
     return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -753,10 +756,10 @@ def get_audit_log(case_id: str) -> AuditLogResponse:
 
     entries = [
         AuditLogEntry(
-            timestamp=row["timestamp"],
-            message=row["message"],
+            timestamp=timestamp,
+            message=message,
         )
-        for row in rows
+        for timestamp, message in rows
     ]
 
     return AuditLogResponse(
@@ -802,6 +805,9 @@ UPLOAD_DIR = Path("/app/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 
+# Deletes ASCII digits; an address equal to its stripped copy has none
+_STRIP_DIGITS = str.maketrans('', '', '0123456789')
+
 def pre_validate_case(citizen_data: dict) -> tuple:
     """
     Check if case has all required data and is clean enough for auto-processing.
@@ -820,7 +826,7 @@ def pre_validate_case(citizen_data: dict) -> tuple:
     new_addr = citizen_data.get('new_address_raw', '')
     if len(new_addr) < 10:
         issues.append("New address too short")
-    if not any(c.isdigit() for c in new_addr):
+    if new_addr.translate(_STRIP_DIGITS) == new_addr:
         issues.append("New address missing house number or postal code")
     
     old_addr = citizen_data.get('old_address_raw', '')
@@ -1072,7 +1078,7 @@ async def submit_case(
                         pdf_landlord_path, pdf_address_change_path,
                         submitted_at
                     ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
                     );
                     """,
                     (
@@ -1088,7 +1094,6 @@ async def submit_case(
                         source,  # Source from form parameter ('portal' or 'email')
                         str(landlord_path),
                         str(address_path),
-                        dt.now()
                     )
                 )
         
@@ -1146,6 +1151,7 @@ async def submit_case(
                             (case_id,)
                         )
                         conn.commit()
+                    forget_case_status(case_id)
             
             # Start workflow in background
             thread = threading.Thread(target=run_auto_workflow)
@@ -1554,11 +1560,10 @@ async def resolve_hitl(case_id: str, corrected_address: str = Form(...)):
                 )
 
         # Update canonical address with corrected value
-        from .db import set_canonical_address, update_case_status, add_audit_entry, store_resolution
+        from .db import update_case, add_audit_entry, add_audit_entries, store_resolution
         
         original_address = row["new_address_raw"]
-        set_canonical_address(case_id, corrected_address)
-        update_case_status(case_id, "QUALITY_OK")
+        update_case(case_id, canonical_address=corrected_address, status="QUALITY_OK")
         add_audit_entry(
             case_id,
             f"HITL resolved: Admin corrected address to '{corrected_address}'"
@@ -1650,9 +1655,11 @@ async def resolve_hitl(case_id: str, corrected_address: str = Form(...)):
             
             # Log what was learned
             if patterns_learned:
-                for pattern in patterns_learned:
-                    add_audit_entry(case_id, f"Memory learned: {pattern}")
-                add_audit_entry(case_id, f"Total patterns learned: {len(patterns_learned)}")
+                add_audit_entries(
+                    case_id,
+                    [f"Memory learned: {pattern}" for pattern in patterns_learned]
+                    + [f"Total patterns learned: {len(patterns_learned)}"]
+                )
             else:
                 add_audit_entry(case_id, "No new patterns to learn (addresses were similar)")
                 
@@ -1699,6 +1706,7 @@ async def resolve_hitl(case_id: str, corrected_address: str = Form(...)):
                         (case_id,)
                     )
                     conn.commit()
+                forget_case_status(case_id)
         
         import threading
         thread = threading.Thread(target=resume_workflow)
@@ -1744,10 +1752,11 @@ async def approve_case(case_id: str):
         # Update status to PROCESSING
         with get_conn() as conn, conn.cursor() as cur:
             cur.execute(
-                "UPDATE cases SET status = 'PROCESSING', approved_at = %s WHERE case_id = %s",
-                (dt.now(), case_id)
+                "UPDATE cases SET status = 'PROCESSING', approved_at = NOW() WHERE case_id = %s",
+                (case_id,)
             )
             conn.commit()
+        forget_case_status(case_id)
         
         # Prepare inputs for crew
         inputs = {
@@ -1793,6 +1802,7 @@ async def approve_case(case_id: str):
                         (case_id,)
                     )
                     conn.commit()
+                forget_case_status(case_id)
 
         import threading
         thread = threading.Thread(target=run_workflow)
@@ -1811,6 +1821,7 @@ async def approve_case(case_id: str):
                     (case_id,)
                 )
                 conn.commit()
+            forget_case_status(case_id)
         except:
             pass
         raise HTTPException(status_code=500, detail=str(e))
@@ -1907,6 +1918,37 @@ async def chat(request: ChatRequest):
         )
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chatbot endpoint (Server-Sent Events).
+    Sends {"delta": ...} events as tokens arrive, then a final event with
+    "done": true carrying the same fields as /chat.
+    """
+    import json
+    from .chatbot_service import get_chatbot
+    
+    try:
+        chatbot = get_chatbot()
+    except Exception as e:
+        print(f"Chat error: {e}")
+        chatbot = None
+    
+    def event_generator():
+        if chatbot is None:
+            payload = {
+                "reply": "I'm sorry, I'm having trouble right now. Please try again.",
+                "has_document_preview": False,
+                "done": True
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+            return
+        for payload in chatbot.stream_response(request.message):
+            yield f"data: {json.dumps(payload)}\n\n"
+    
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
 @app.post("/chat/reset")
 async def reset_chat():
     """Reset the chatbot conversation history."""
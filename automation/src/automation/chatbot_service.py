@@ -114,34 +114,35 @@ class ChatbotService:
         
         return None
     
-    def get_response(self, user_message: str) -> dict:
+    def _document_preview_response(self, user_message: str) -> dict:
         """
-        Get a response from the chatbot.
-        Returns dict with reply text and optional document preview info.
+        Build the canned document-preview reply, or None if the message
+        is not asking to see a document.
         """
-        # Check for document preview request first
         document_info = self.detect_document_request(user_message)
         
-        if document_info:
-            if document_info["type"] == "both":
-                return {
-                    "reply": "Here are the two required documents for your address change. Click on each to view in detail:",
-                    "has_document_preview": True,
-                    "document_type": document_info["type"],
-                    "document_name": document_info["name"],
-                    "document_url": document_info["url"],
-                    "document_url2": document_info.get("url2")
-                }
-            else:
-                return {
-                    "reply": f"Here's an example of the {document_info['name']}. This shows you what the document should look like:",
-                    "has_document_preview": True,
-                    "document_type": document_info["type"],
-                    "document_name": document_info["name"],
-                    "document_url": document_info["url"]
-                }
+        if not document_info:
+            return None
         
-        # Add user message to history
+        if document_info["type"] == "both":
+            return {
+                "reply": "Here are the two required documents for your address change. Click on each to view in detail:",
+                "has_document_preview": True,
+                "document_type": document_info["type"],
+                "document_name": document_info["name"],
+                "document_url": document_info["url"],
+                "document_url2": document_info.get("url2")
+            }
+        return {
+            "reply": f"Here's an example of the {document_info['name']}. This shows you what the document should look like:",
+            "has_document_preview": True,
+            "document_type": document_info["type"],
+            "document_name": document_info["name"],
+            "document_url": document_info["url"]
+        }
+    
+    def _build_messages(self, user_message: str) -> list:
+        """Add the user message to history and return the messages for the API call."""
         self.conversation_history.append({
             "role": "user",
             "content": user_message
@@ -151,14 +152,28 @@ class ChatbotService:
         if len(self.conversation_history) > 10:
             self.conversation_history = self.conversation_history[-10:]
         
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            *self.conversation_history
+        ]
+    
+    def get_response(self, user_message: str) -> dict:
+        """
+        Get a response from the chatbot.
+        Returns dict with reply text and optional document preview info.
+        """
+        # Check for document preview request first
+        document_response = self._document_preview_response(user_message)
+        if document_response:
+            return document_response
+        
+        messages = self._build_messages(user_message)
+        
         try:
             # Call OpenAI API
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    *self.conversation_history
-                ],
+                messages=messages,
                 max_tokens=300,
                 temperature=0.7
             )
@@ -184,6 +199,59 @@ class ChatbotService:
                 "error": str(e)
             }
     
+    def stream_response(self, user_message: str):
+        """
+        Stream a response from the chatbot as it is generated.
+        Yields {"delta": text} for each chunk, then a final dict shaped like
+        get_response() with "done": True and the full reply.
+        """
+        document_response = self._document_preview_response(user_message)
+        if document_response:
+            yield {**document_response, "done": True}
+            return
+        
+        messages = self._build_messages(user_message)
+        parts = []
+        
+        try:
+            stream = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=300,
+                temperature=0.7,
+                stream=True
+            )
+            
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield {"delta": delta}
+            
+            # Only materialize the full message once, for the history
+            assistant_message = "".join(parts)
+            self.conversation_history.append({
+                "role": "assistant",
+                "content": assistant_message
+            })
+            
+            yield {
+                "reply": assistant_message,
+                "has_document_preview": False,
+                "done": True
+            }
+            
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+            yield {
+                "reply": "I'm sorry, I'm having trouble connecting right now. Please try again in a moment.",
+                "has_document_preview": False,
+                "error": str(e),
+                "done": True
+            }
+    
     def reset_conversation(self):
         """Reset the conversation history."""
         self.conversation_history = []
@@ -1,11 +1,12 @@
-from typing import List, Callable, Any
+import os
+import re
+from functools import lru_cache
+from typing import List, Callable, Any, Dict, Optional
 from crewai import Agent, Crew, Process, Task, LLM
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, after_kickoff, agent, before_kickoff, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from dotenv import load_dotenv
 
-from dotenv import load_dotenv
-
 # Import all tools
 from src.automation.tools.crewai_tools import (
     ingest_case_tool,
@@ -21,8 +22,44 @@ from src.automation.tools.crewai_tools import (
 
 load_dotenv()  # load OPENAI_API_KEY etc. from .env if present
 
+# Set LLM_AUDIT=true to summarize the audit log with the audit_officer agent
+# instead of the deterministic markdown renderer (useful for debugging prompts)
+LLM_AUDIT = os.getenv("LLM_AUDIT", "false").lower() == "true"
+AUDIT_LOG_PATH = "output/audit_log.md"
+
+
+@lru_cache(maxsize=1)
+def _shared_llm() -> LLM:
+    """
+    Build the LLM client on first use rather than at import time,
+    so importing this module stays cheap and load_dotenv() always runs first.
+    """
+    return LLM(
+        model="gpt-4o-mini",
+        temperature=0.1,  # Lower temperature for more deterministic outputs
+    )
+
+
+# ===== AUDIT LOG RENDERING =====
+def render_audit_log(case_id: str, rows: List[tuple]) -> str:
+    """
+    Render audit entries as a chronological markdown list.
+    Replaces the LLM summary: the data is already structured in Postgres.
+    """
+    lines = [f"# Audit Log - {case_id}", ""]
+    if rows:
+        for timestamp, message in rows:
+            lines.append(f"- **{timestamp.isoformat()}** - {message}")
+    else:
+        lines.append(f"- No audit entries found for {case_id}")
+    lines.append("")
+    return "\n".join(lines)
+
 
 # ===== CONDITIONAL EXECUTION HELPER =====
+_CASE_ID_RE = re.compile(r'Case ID:?\s*(\d+)')
+
+
 def create_hitl_check_condition() -> Callable:
     """
     Creates a condition function that checks if the case is waiting for HITL.
@@ -34,7 +71,7 @@ def create_hitl_check_condition() -> Callable:
         Returns True if task should execute, False if it should be skipped.
         """
         try:
-            from src.automation.db import fetch_case_by_id, add_audit_entry
+            from src.automation.db import fetch_case_status, add_audit_entry
             
             # Try to extract case_id from context
             case_id = None
@@ -43,14 +80,14 @@ def create_hitl_check_condition() -> Callable:
                 case_id = citizen_data.get('case_id')
             elif isinstance(context, str):
                 # Try to parse case_id from string context
-                import re
-                match = re.search(r'Case ID:?\s*(\d+)', str(context))
+                match = _CASE_ID_RE.search(context)
                 if match:
                     case_id = f"Case ID: {match.group(1)}"
             
             if case_id:
-                case_row = fetch_case_by_id(case_id)
-                if case_row and case_row.get("status") == "WAITING_FOR_HUMAN":
+                # Read the current status: assess_quality can switch the case
+                # to WAITING_FOR_HUMAN in the middle of a crew run
+                if fetch_case_status(case_id) == "WAITING_FOR_HUMAN":
                     add_audit_entry(case_id, "Task conditionally skipped - case waiting for HITL")
                     print(f"⏭️ Task skipped for {case_id} - HITL pending")
                     return False  # Skip task
@@ -73,16 +110,46 @@ class AddressChangeMain:
     agents_config = "config/agents.yaml"
     tasks_config = "config/tasks.yaml"
 
-    llm = LLM(
-        model="gpt-4o-mini",
-        temperature=0.1,  # Lower temperature for more deterministic outputs
-    )
+    def __init__(self):
+        self._case_id: Optional[str] = None
+        self.hitl_check = create_hitl_check_condition()
+
+    @before_kickoff
+    def remember_case_id(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep the case_id of this run for write_audit_log (None for new cases)."""
+        citizen_data = inputs.get("citizen_data") or {}
+        self._case_id = citizen_data.get("case_id") if hasattr(citizen_data, "get") else None
+        return inputs
+
+    @after_kickoff
+    def write_audit_log(self, result: Any) -> Any:
+        """
+        Write output/audit_log.md straight from the audit_logs table.
+        Skipped when LLM_AUDIT is enabled (the audit task writes it instead).
+        """
+        if LLM_AUDIT:
+            return result
+        try:
+            from src.automation.db import get_audit_entries
+
+            case_id = self._case_id
+            if not case_id:
+                # New cases get their id from ingest_case; recover it from the output
+                match = _CASE_ID_RE.search(str(result))
+                case_id = f"Case ID: {match.group(1)}" if match else None
+            if case_id:
+                os.makedirs(os.path.dirname(AUDIT_LOG_PATH), exist_ok=True)
+                with open(AUDIT_LOG_PATH, "w", encoding="utf-8") as f:
+                    f.write(render_audit_log(case_id, get_audit_entries(case_id)))
+        except Exception as e:
+            print(f"Audit log rendering error: {e}")
+        return result
 
     @agent
     def ingest_case_agent(self) -> Agent:
         return Agent(
             config=self.agents_config["ingest_case_agent"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,  # Enable to see agent activity
             tools=[ingest_case_tool],
         )
@@ -91,7 +158,7 @@ class AddressChangeMain:
     def verification_officer(self) -> Agent:
         return Agent(
             config=self.agents_config["verification_officer"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,
             tools=[verify_identity_tool],
         )
@@ -100,7 +167,7 @@ class AddressChangeMain:
     def quality_confidence_officer(self) -> Agent:
         return Agent(
             config=self.agents_config["quality_confidence_officer"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,
             tools=[assess_quality_tool, lookup_similar_cases_tool],  # Added memory lookup tool
         )
@@ -109,7 +176,7 @@ class AddressChangeMain:
     def business_rules_officer(self) -> Agent:
         return Agent(
             config=self.agents_config["business_rules_officer"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,
             tools=[check_business_rules_tool],
         )
@@ -118,7 +185,7 @@ class AddressChangeMain:
     def registry_update_officer(self) -> Agent:
         return Agent(
             config=self.agents_config["registry_update_officer"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,
             tools=[update_registry_tool],
         )
@@ -127,7 +194,7 @@ class AddressChangeMain:
     def certificate_officer(self) -> Agent:
         return Agent(
             config=self.agents_config["certificate_officer"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,
             tools=[generate_certificate_tool],
         )
@@ -136,7 +203,7 @@ class AddressChangeMain:
     def audit_officer(self) -> Agent:
         return Agent(
             config=self.agents_config["audit_officer"],
-            llm=self.llm,
+            llm=_shared_llm(),
             verbose=True,
             tools=[get_audit_log_tool],
         )
@@ -199,7 +266,8 @@ class AddressChangeMain:
     @task
     def generate_audit_log_task(self) -> Task:
         """
-        Audit log task always runs to capture the full workflow state.
+        LLM audit summary, only scheduled when LLM_AUDIT is enabled.
+        By default the audit log is rendered by write_audit_log after kickoff.
         """
         return Task(
             config=self.tasks_config["generate_audit_log_task"],
@@ -226,9 +294,17 @@ class AddressChangeMain:
              # We can keep this one simple or mute it entirely
              pass
 
+        agents = self.agents
+        tasks = self.tasks
+        if not LLM_AUDIT:
+            audit_agent = self.audit_officer()
+            audit_task = self.generate_audit_log_task()
+            agents = [a for a in agents if a is not audit_agent]
+            tasks = [t for t in tasks if t is not audit_task]
+
         return Crew(
-            agents=self.agents,
-            tasks=self.tasks,
+            agents=agents,
+            tasks=tasks,
             process=Process.sequential,
             verbose=False,  # Disable CrewAI's verbose output
             step_callback=step_callback,
@@ -1,30 +1,162 @@
 # src/automation/db.py
 import os
+import re
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
+import psycopg2.extensions
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 DB_DSN = os.getenv("DATABASE_URL", "postgresql://app_user:app_pass@db:5432/address_db")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+# Connections idle for longer than this are pinged before being handed out,
+# so ones the server (or a proxy) closed in the meantime are replaced
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30.0"))
+
+# Server-side prepared statements are per session; disable them behind a
+# transaction-mode pooler such as PgBouncer / the Supabase pooler (port 6543)
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() == "true"
+
+# Case status as last written or read by this process. The HITL gates check
+# it before every workflow step; the short TTL bounds how long a change made
+# elsewhere (another worker) can go unseen. It is sized to outlast the agent
+# turn between two tools, so consecutive gates reuse the status each tool
+# writes instead of querying it again.
+CASE_STATUS_TTL = float(os.getenv("CASE_STATUS_TTL", "5.0"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises PoolError instead of waiting once DB_POOL_MAX
+# connections are out; callers block on this semaphore instead
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_status_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+_status_cache_lock = threading.Lock()
+# Upper bound on cached statuses; expired entries are pruned once it is reached
+CASE_STATUS_CACHE_MAX = int(os.getenv("CASE_STATUS_CACHE_MAX", "1024"))
+
+# Hot statements, prepared once per pooled connection and run via EXECUTE
+_PREPARED_STATEMENTS = {
+    "upd_case_status": "UPDATE cases SET status = $1, updated_at = NOW() WHERE case_id = $2",
+    "upd_case_canonical_address": "UPDATE cases SET canonical_address = $1, updated_at = NOW() WHERE case_id = $2",
+    "upd_case_registry_exists": "UPDATE cases SET registry_exists = $1, updated_at = NOW() WHERE case_id = $2",
+    "sel_case_status": "SELECT status FROM cases WHERE case_id = $1",
+    "sel_canonical_address": "SELECT canonical_address FROM cases WHERE case_id = $1",
+    "ins_audit_log": "INSERT INTO audit_logs (case_id, message) VALUES ($1, $2)",
+}
+# The same statements with psycopg2 placeholders, used when preparing is disabled
+_PLAIN_STATEMENTS = {
+    name: re.sub(r"\$\d+", "%s", sql) for name, sql in _PREPARED_STATEMENTS.items()
+}
+
+class _Connection(psycopg2.extensions.connection):
+    """Connection that remembers whether the hot statements were prepared on it."""
+    statements_prepared = False
+    last_used = 0.0  # monotonic time it was returned to the pool; 0 while fresh
+
+def _prepare_statements(conn):
+    """PREPARE the hot statements on a fresh connection (once per session)."""
+    with conn.cursor() as cur:
+        for name, sql in _PREPARED_STATEMENTS.items():
+            cur.execute(f"PREPARE {name} AS {sql};")
+    conn.commit()
+    conn.statements_prepared = True
+
+def _statement_sql(cur, name: str, params: tuple) -> bytes:
+    """Render a hot statement by name, as EXECUTE when it is prepared on this connection."""
+    if cur.connection.statements_prepared:
+        placeholders = ", ".join(["%s"] * len(params))
+        return cur.mogrify(f"EXECUTE {name} ({placeholders});", params)
+    return cur.mogrify(_PLAIN_STATEMENTS[name] + ";", params)
+
+def _execute_statement(cur, name: str, params: tuple):
+    """Run a hot statement by name, via EXECUTE when it is prepared on this connection."""
+    cur.execute(_statement_sql(cur, name, params))
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Create the shared connection pool on first use (thread-safe)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    DB_DSN,
+                    connection_factory=_Connection,
+                    cursor_factory=RealDictCursor,
+                )
+    return _pool
+
+def _is_alive(conn) -> bool:
+    """Cheap liveness check for a connection that sat idle in the pool."""
+    if conn.closed:
+        return False
+    if not conn.last_used or time.monotonic() - conn.last_used < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _checkout(pool: ThreadedConnectionPool):
+    """Take a live connection from the pool, discarding stale ones."""
+    while True:
+        conn = pool.getconn()
+        if _is_alive(conn):
+            return conn
+        pool.putconn(conn, close=True)
 
 @contextmanager
 def get_conn():
-    conn = psycopg2.connect(DB_DSN, cursor_factory=RealDictCursor)
+    """
+    Borrow a pooled connection for one transaction.
+    Waits for a free slot when all DB_POOL_MAX connections are in use.
+    Commits on success, rolls back on error, and always returns the
+    connection to the pool (broken connections are discarded).
+    """
+    pool = _get_pool()
+    _pool_slots.acquire()
+    try:
+        conn = _checkout(pool)
+    except Exception:
+        _pool_slots.release()
+        raise
     try:
+        if DB_PREPARED_STATEMENTS and not conn.statements_prepared:
+            _prepare_statements(conn)
         yield conn
         conn.commit()
     except Exception:
-        conn.rollback()
+        if not conn.closed:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        conn.last_used = time.monotonic()
+        pool.putconn(conn, close=bool(conn.closed))
+        _pool_slots.release()
+
+# Optional "Case ID" prefix (any case, optional ':' or '#') followed by the number
+_CASE_ID_RE = re.compile(r'^\s*(?:case\s*id\s*[:#]?\s*)?(\d+)\s*$', re.IGNORECASE)
 
+
+@lru_cache(maxsize=4096)
 def normalize_case_id(case_id: str) -> str:
     """
     Normalize case_id to ensure it's in the format 'Case ID: N'.
     
     Handles cases where agents might pass just the number (e.g., "11" instead of "Case ID: 11").
+    Called at the top of every helper, so the canonical form returns without any work
+    and results are memoized (only a few hundred distinct ids are live at a time).
     
     Args:
         case_id: Either "Case ID: N" or just "N"
@@ -32,141 +164,377 @@ def normalize_case_id(case_id: str) -> str:
     Returns:
         Normalized case_id in format "Case ID: N"
     """
-    case_id = case_id.strip()
-    
-    # If it already starts with "Case ID:", return as-is
-    if case_id.startswith("Case ID:"):
+    # Fast path: already "Case ID: N" (the dominant input)
+    if case_id.startswith("Case ID: ") and case_id[9:].isdigit():
         return case_id
     
-    # If it's just a number, format it properly
-    if case_id.isdigit():
-        return f"Case ID: {case_id}"
-    
-    # If it looks like "Case ID N" (missing colon), add it
-    if case_id.lower().startswith("case id"):
-        parts = case_id.split()
-        if len(parts) >= 3:
-            return f"Case ID: {parts[-1]}"
+    # "11", "Case ID:11", "case id 11", "Case ID #11", ...
+    match = _CASE_ID_RE.match(case_id)
+    if match:
+        return f"Case ID: {match.group(1)}"
     
     # Otherwise, return as-is and let the database handle it
-    return case_id
+    return case_id.strip()
 
-def create_case(data: dict, source: str = 'portal') -> str:
+def create_case(data: dict, source: str = 'portal', audit_message: Optional[str] = None) -> str:
     """Insert a new case and return case_id like 'Case ID: 1'.
     
+    The id is drawn from the sequence inside the statement, so the
+    human-readable case_id is written by the INSERT itself (one round trip).
+    
     Args:
         data: Case data dictionary
         source: 'portal' or 'email' indicating submission source
+        audit_message: Optional first audit entry, inserted by the same statement
     """
     with get_conn() as conn, conn.cursor() as cur:
         # Add source to data dict for named parameter substitution
-        data_with_source = {**data, 'source': source}
+        data_with_source = {**data, 'source': source, 'audit_message': audit_message}
         cur.execute(
             """
+            WITH new_case AS (
+                SELECT nextval(pg_get_serial_sequence('cases', 'id')) AS id
+            ), first_audit AS (
+                INSERT INTO audit_logs (case_id, message)
+                SELECT 'Case ID: ' || id, %(audit_message)s FROM new_case
+                WHERE %(audit_message)s IS NOT NULL
+            )
             INSERT INTO cases (
+                id, case_id,
                 citizen_name, dob, email,
                 old_address_raw, new_address_raw,
                 move_in_date_raw, landlord_name,
                 status, source
             )
-            VALUES (%(citizen_name)s, %(dob)s, %(email)s,
+            VALUES ((SELECT id FROM new_case), 'Case ID: ' || (SELECT id FROM new_case),
+                    %(citizen_name)s, %(dob)s, %(email)s,
                     %(old_address_raw)s, %(new_address_raw)s,
                     %(move_in_date_raw)s, %(landlord_name)s,
                     'INGESTED', %(source)s)
-            RETURNING id;
+            RETURNING case_id;
             """,
             data_with_source,
         )
-        row = cur.fetchone()
-        numeric_id = row["id"]
-        case_id = f"Case ID: {numeric_id}"
-
-        # store human-readable case_id as well
-        cur.execute(
-            "UPDATE cases SET case_id = %s, updated_at = %s WHERE id = %s;",
-            (case_id, datetime.utcnow(), numeric_id),
-        )
+        case_id = cur.fetchone()["case_id"]
 
     return case_id
 
-def update_case_status(case_id: str, status: str):
-    case_id = normalize_case_id(case_id)
+def create_cases_bulk(rows: List[dict], source: str = 'portal') -> List[str]:
+    """Insert many cases at once and return their case_ids in input order.
+    
+    Reserves all ids with one query and inserts every row with one
+    execute_values statement, instead of a round trip per case.
+    
+    Args:
+        rows: List of case data dictionaries (same keys as create_case)
+        source: 'portal' or 'email' indicating submission source
+    """
+    if not rows:
+        return []
+    
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            "UPDATE cases SET status = %s, updated_at = %s WHERE case_id = %s;",
-            (status, datetime.utcnow(), case_id),
+            "SELECT nextval(pg_get_serial_sequence('cases', 'id')) AS id FROM generate_series(1, %s);",
+            (len(rows),),
+        )
+        ids = [r["id"] for r in cur.fetchall()]
+        case_ids = [f"Case ID: {numeric_id}" for numeric_id in ids]
+        
+        execute_values(
+            cur,
+            """
+            INSERT INTO cases (
+                id, case_id,
+                citizen_name, dob, email,
+                old_address_raw, new_address_raw,
+                move_in_date_raw, landlord_name,
+                status, source
+            )
+            VALUES %s;
+            """,
+            [
+                (
+                    numeric_id, case_id,
+                    row["citizen_name"], row["dob"], row["email"],
+                    row["old_address_raw"], row["new_address_raw"],
+                    row["move_in_date_raw"], row.get("landlord_name"),
+                    source,
+                )
+                for numeric_id, case_id, row in zip(ids, case_ids, rows)
+            ],
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, 'INGESTED', %s)",
         )
 
-def set_canonical_address(case_id: str, canonical_address: str):
+    return case_ids
+
+# Columns that update_case() may write; keeps column names out of caller control
+_UPDATABLE_CASE_COLUMNS = frozenset({
+    "status",
+    "canonical_address",
+    "registry_exists",
+    "had_hitl",
+})
+
+def update_case(case_id: str, **fields):
+    """
+    Update several case columns in a single UPDATE (one round trip).
+    updated_at is always bumped.
+    
+    Example:
+        update_case(case_id, status="UPDATED", canonical_address=addr)
+    """
+    if not fields:
+        return
     case_id = normalize_case_id(case_id)
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "UPDATE cases SET canonical_address = %s, updated_at = %s WHERE case_id = %s;",
-            (canonical_address, datetime.utcnow(), case_id),
-        )
+        cur.execute(_case_update_sql(cur, case_id, fields))
+    _remember_status(case_id, fields)
 
-def set_registry_exists(case_id: str, exists: bool):
+def _case_update_sql(cur, case_id: str, fields: dict) -> bytes:
+    """Render the UPDATE for update_case() as a bound statement."""
+    unknown = set(fields) - _UPDATABLE_CASE_COLUMNS
+    if unknown:
+        raise ValueError(f"Cannot update case columns: {sorted(unknown)}")
+    
+    if len(fields) == 1:
+        # Single-column updates are the common case; use the prepared statement
+        (column, value), = fields.items()
+        statement = f"upd_case_{column}"
+        if statement in _PREPARED_STATEMENTS:
+            return _statement_sql(cur, statement, (value, case_id))
+    
+    assignments = ", ".join(f"{column} = %s" for column in fields)
+    return cur.mogrify(
+        f"UPDATE cases SET {assignments}, updated_at = NOW() WHERE case_id = %s;",
+        (*fields.values(), case_id),
+    )
+
+def update_case_and_log(case_id: str, message: str, **fields):
+    """
+    Update case columns and record an audit message in one round trip.
+    
+    psycopg2 has no pipeline mode, so both statements are sent as a single
+    query string and run in one transaction. Inside an AuditBuffer, the rows
+    queued so far are written by the same INSERT, so a tool's whole audit
+    trail and its status change commit together.
+    
+    Example:
+        update_case_and_log(case_id, "Registry updated.", status="UPDATED")
+    """
     case_id = normalize_case_id(case_id)
+    buffer = _audit_buffer.get()
+    pending = list(buffer) if buffer else []
+    rows = pending + [(case_id, message)]
+    
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "UPDATE cases SET registry_exists = %s, updated_at = %s WHERE case_id = %s;",
-            (exists, datetime.utcnow(), case_id),
-        )
+        if len(rows) == 1:
+            statements = [_statement_sql(cur, "ins_audit_log", rows[0])]
+        else:
+            values = b",".join(cur.mogrify("(%s, %s)", row) for row in rows)
+            statements = [b"INSERT INTO audit_logs (case_id, message) VALUES " + values + b";"]
+        if fields:
+            statements.insert(0, _case_update_sql(cur, case_id, fields))
+        cur.execute(b" ".join(statements))
+    # Only drop the queued rows once they are committed
+    if pending:
+        del buffer[:len(pending)]
+    _remember_status(case_id, fields)
+
+def forget_case_status(case_id: str):
+    """Drop the cached status after changing it outside update_case()."""
+    with _status_cache_lock:
+        _status_cache.pop(normalize_case_id(case_id), None)
+
+def _cache_status(case_id: str, status: Optional[str]):
+    """Store a status for CASE_STATUS_TTL seconds, keeping the cache bounded."""
+    now = time.monotonic()
+    with _status_cache_lock:
+        _status_cache.pop(case_id, None)  # re-insert so dict order is write order
+        if len(_status_cache) >= CASE_STATUS_CACHE_MAX:
+            for key in [k for k, (expires, _) in _status_cache.items() if expires <= now]:
+                del _status_cache[key]
+            # Still full of live entries: drop the oldest writes
+            while len(_status_cache) >= CASE_STATUS_CACHE_MAX:
+                del _status_cache[next(iter(_status_cache))]
+        _status_cache[case_id] = (now + CASE_STATUS_TTL, status)
+
+def _remember_status(case_id: str, fields: dict):
+    """Write-through for fetch_case_status() after a committed update."""
+    if "status" in fields:
+        _cache_status(case_id, fields["status"])
+
+def update_case_status(case_id: str, status: str):
+    update_case(case_id, status=status)
+
+def set_canonical_address(case_id: str, canonical_address: str):
+    update_case(case_id, canonical_address=canonical_address)
+
+def set_registry_exists(case_id: str, exists: bool):
+    update_case(case_id, registry_exists=exists)
 
 def set_had_hitl(case_id: str, had_hitl: bool = True):
     """Mark a case as having required human-in-the-loop intervention."""
-    case_id = normalize_case_id(case_id)
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "UPDATE cases SET had_hitl = %s, updated_at = %s WHERE case_id = %s;",
-            (had_hitl, datetime.utcnow(), case_id),
-        )
+    update_case(case_id, had_hitl=had_hitl)
 
 def get_canonical_address(case_id: str) -> str:
     """Retrieve the canonical address for a given case."""
     case_id = normalize_case_id(case_id)
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "SELECT canonical_address FROM cases WHERE case_id = %s;",
-            (case_id,),
-        )
+        _execute_statement(cur, "sel_canonical_address", (case_id,))
         row = cur.fetchone()
         return row["canonical_address"] if row else None
 
+def fetch_case_status(case_id: str) -> str:
+    """
+    Fetch only the status of a case (the HITL-gate hot path).
+    Returns the status string, or None if not found.
+    
+    Served from the short-lived status cache when this process wrote or
+    read the status within the last CASE_STATUS_TTL seconds.
+    """
+    case_id = normalize_case_id(case_id)
+    cached = _status_cache.get(case_id)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    
+    with get_conn() as conn, conn.cursor() as cur:
+        _execute_statement(cur, "sel_case_status", (case_id,))
+        row = cur.fetchone()
+    status = row["status"] if row else None
+    if status is not None:
+        _cache_status(case_id, status)
+    return status
+
 def fetch_case_by_id(case_id: str) -> dict:
     """
-    Fetch complete case details by case_id.
-    Returns a dictionary with all case fields, or None if not found.
+    Fetch the workflow-relevant case fields by case_id.
+    Returns a dictionary with those fields, or None if not found.
     """
     case_id = normalize_case_id(case_id)
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            "SELECT * FROM cases WHERE case_id = %s;",
+            """
+            SELECT case_id, status, citizen_name, email,
+                   canonical_address, registry_exists, updated_at
+            FROM cases
+            WHERE case_id = %s;
+            """,
             (case_id,),
         )
         row = cur.fetchone()
         return dict(row) if row else None
 
-def add_audit_entry(case_id: str, message: str):
-    case_id = normalize_case_id(case_id)
+# Audit rows collected by an active AuditBuffer in the current thread/task
+_audit_buffer: ContextVar[Optional[list]] = ContextVar("_audit_buffer", default=None)
+
+def _insert_audit_rows(rows: List[tuple]):
+    """
+    Insert (case_id, message) rows with one multi-row INSERT.
+    
+    The transaction commits with synchronous_commit off, so it does not wait
+    for the WAL flush. Durability trade-off: a database crash can lose the
+    last few hundred milliseconds of audit rows, but never corrupts the
+    table or leaves partial batches. The table stays logged (crash-safe
+    otherwise), and case updates keep synchronous commits.
+    """
+    if not rows:
+        return
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO audit_logs (case_id, message)
-            VALUES (%s, %s);
-            """,
-            (case_id, message),
+        if len(rows) == 1:
+            # The common single entry: prepared INSERT, sent with the SET LOCAL
+            cur.execute(b"SET LOCAL synchronous_commit = OFF; " + _statement_sql(cur, "ins_audit_log", rows[0]))
+            return
+        cur.execute("SET LOCAL synchronous_commit = OFF;")
+        execute_values(
+            cur,
+            "INSERT INTO audit_logs (case_id, message) VALUES %s;",
+            rows,
+            page_size=200,
         )
 
-def get_audit_entries(case_id: str):
+def add_audit_entries(case_id: str, messages: List[str]):
+    """Insert several audit messages for one case in a single round trip."""
     case_id = normalize_case_id(case_id)
-    with get_conn() as conn, conn.cursor() as cur:
+    _insert_audit_rows([(case_id, message) for message in messages])
+
+def add_audit_entry(case_id: str, message: str):
+    """
+    Record an audit message. Inside an AuditBuffer the row is queued
+    and written with the buffer's next flush instead of immediately.
+    """
+    case_id = normalize_case_id(case_id)
+    buffer = _audit_buffer.get()
+    if buffer is not None:
+        buffer.append((case_id, message))
+        return
+    _insert_audit_rows([(case_id, message)])
+
+class AuditBuffer:
+    """
+    Collect add_audit_entry() calls and write them with one INSERT.
+    
+    Flushes on exit (also when the block raises, so the trail is kept)
+    and whenever flush_every rows are queued. Nested buffers share the
+    outermost one.
+    
+    Example:
+        with AuditBuffer():
+            add_audit_entry(case_id, "step 1")
+            add_audit_entry(case_id, "step 2")
+    """
+    def __init__(self, flush_every: int = 200):
+        self.flush_every = flush_every
+        self._rows: Optional[list] = None
+        self._token = None
+
+    def __enter__(self):
+        if _audit_buffer.get() is None:
+            self._rows = _BufferList(self)
+            self._token = _audit_buffer.set(self._rows)
+        return self
+
+    def flush(self):
+        if self._rows:
+            rows = list(self._rows)
+            self._rows.clear()
+            _insert_audit_rows(rows)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return False
+        try:
+            self.flush()
+        finally:
+            _audit_buffer.reset(self._token)
+            self._token = None
+        return False
+
+class _BufferList(list):
+    """Row list that triggers its owner's flush once it reaches flush_every rows."""
+    def __init__(self, owner: AuditBuffer):
+        super().__init__()
+        self._owner = owner
+
+    def append(self, row):
+        super().append(row)
+        if len(self) >= self._owner.flush_every:
+            self._owner.flush()
+
+def get_audit_entries(case_id: str) -> List[Tuple]:
+    """
+    Audit trail of a case as (timestamp, message) tuples, oldest first.
+    
+    Uses a plain tuple cursor instead of the pool's RealDictCursor, so no
+    dict is built per row.
+    """
+    case_id = normalize_case_id(case_id)
+    with get_conn() as conn, conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
         cur.execute(
             """
             SELECT timestamp, message
             FROM audit_logs
             WHERE case_id = %s
-            ORDER BY timestamp ASC;
+            ORDER BY timestamp ASC, id ASC;
             """,
             (case_id,),
         )
@@ -174,6 +542,26 @@ def get_audit_entries(case_id: str):
     return rows
 
 
+def get_audit_lines(case_id: str) -> List[str]:
+    """
+    Audit trail of a case as "<ISO timestamp> - <message>" lines, oldest first.
+    
+    Postgres formats each line, so one text column per row comes back and
+    no per-row isoformat()/f-string work is left to Python.
+    """
+    case_id = normalize_case_id(case_id)
+    with get_conn() as conn, conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute(
+            """
+            SELECT to_char(timestamp, 'YYYY-MM-DD"T"HH24:MI:SS.USTZH:TZM') || ' - ' || message
+            FROM audit_logs
+            WHERE case_id = %s
+            ORDER BY timestamp ASC, id ASC;
+            """,
+            (case_id,),
+        )
+        return [line for line, in cur]
+
 # ========================
 # MEMORY SYSTEM FUNCTIONS
 # ========================
@@ -192,42 +580,23 @@ def store_resolution(original_pattern: str, corrected_value: str, resolution_typ
         The resolution ID
     """
     with get_conn() as conn, conn.cursor() as cur:
-        # Check if pattern already exists
+        # Single atomic upsert on the (original_pattern, resolution_type) unique key
         cur.execute(
             """
-            SELECT id, frequency FROM case_resolutions 
-            WHERE original_pattern = %s AND resolution_type = %s;
+            INSERT INTO case_resolutions (original_pattern, corrected_value, resolution_type)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (original_pattern, resolution_type) DO UPDATE
+            SET corrected_value = EXCLUDED.corrected_value,
+                frequency = case_resolutions.frequency + 1,
+                last_used_at = NOW()
+            RETURNING id;
             """,
-            (original_pattern, resolution_type),
+            (original_pattern, corrected_value, resolution_type),
         )
-        existing = cur.fetchone()
-        
-        if existing:
-            # Update existing resolution
-            cur.execute(
-                """
-                UPDATE case_resolutions 
-                SET corrected_value = %s, frequency = frequency + 1, last_used_at = NOW()
-                WHERE id = %s
-                RETURNING id;
-                """,
-                (corrected_value, existing["id"]),
-            )
-            result_id = cur.fetchone()["id"]
-        else:
-            # Insert new resolution
-            cur.execute(
-                """
-                INSERT INTO case_resolutions (original_pattern, corrected_value, resolution_type)
-                VALUES (%s, %s, %s)
-                RETURNING id;
-                """,
-                (original_pattern, corrected_value, resolution_type),
-            )
-            result_id = cur.fetchone()["id"]
-        
-        conn.commit()
-        return result_id
+        result_id = cur.fetchone()["id"]
+    
+    invalidate_pattern_cache()
+    return result_id
 
 
 def lookup_similar_resolution(pattern: str, resolution_type: str = None) -> dict:
@@ -241,29 +610,28 @@ def lookup_similar_resolution(pattern: str, resolution_type: str = None) -> dict
     Returns:
         Dictionary with corrected_value and confidence, or None if not found
     """
+    # ILIKE without wildcards is a case-insensitive equality; lower() = lower()
+    # expresses the same thing but can use idx_case_resolutions_pattern_lower.
+    if "%" in pattern or "_" in pattern:
+        where = "original_pattern ILIKE %s"
+    else:
+        where = "lower(original_pattern) = lower(%s)"
+    params = (pattern,)
+    if resolution_type:
+        where += " AND resolution_type = %s"
+        params += (resolution_type,)
+    
     with get_conn() as conn, conn.cursor() as cur:
-        if resolution_type:
-            cur.execute(
-                """
-                SELECT corrected_value, frequency, resolution_type
-                FROM case_resolutions
-                WHERE original_pattern ILIKE %s AND resolution_type = %s
-                ORDER BY frequency DESC
-                LIMIT 1;
-                """,
-                (pattern, resolution_type),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT corrected_value, frequency, resolution_type
-                FROM case_resolutions
-                WHERE original_pattern ILIKE %s
-                ORDER BY frequency DESC
-                LIMIT 1;
-                """,
-                (pattern,),
-            )
+        cur.execute(
+            f"""
+            SELECT corrected_value, frequency, resolution_type
+            FROM case_resolutions
+            WHERE {where}
+            ORDER BY frequency DESC
+            LIMIT 1;
+            """,
+            params,
+        )
         
         row = cur.fetchone()
         
@@ -281,54 +649,131 @@ def lookup_similar_resolution(pattern: str, resolution_type: str = None) -> dict
         return None
 
 
-def apply_learned_corrections(address: str) -> tuple:
+# In-process snapshot of case_resolutions: the table only changes on HITL
+# resolutions, but is read for every address. Other processes pick up new
+# patterns once their snapshot is older than PATTERN_CACHE_TTL seconds.
+PATTERN_CACHE_TTL = float(os.getenv("PATTERN_CACHE_TTL", "60"))
+_pattern_cache = {"compiled": None, "lookup": None, "loaded_at": 0.0, "version": 0}
+_pattern_cache_lock = threading.Lock()
+
+
+def invalidate_pattern_cache():
+    """Drop the cached pattern snapshot so the next lookup reloads it."""
+    with _pattern_cache_lock:
+        _pattern_cache["compiled"] = None
+        _pattern_cache["lookup"] = None
+        _pattern_cache["loaded_at"] = 0.0
+
+
+def _load_patterns() -> tuple:
+    """
+    Return (compiled_regex, lookup) for all learned patterns, reloading from
+    the database only when the snapshot was invalidated or has expired.
+    compiled_regex is None when no patterns exist.
+    """
+    with _pattern_cache_lock:
+        if _pattern_cache["lookup"] is not None and time.monotonic() - _pattern_cache["loaded_at"] < PATTERN_CACHE_TTL:
+            return _pattern_cache["compiled"], _pattern_cache["lookup"]
+        
+        with get_conn() as conn, conn.cursor() as cur:
+            # Get all known patterns, ordered by pattern length (longest first to avoid partial matches)
+            cur.execute(
+                """
+                SELECT original_pattern, corrected_value, resolution_type
+                FROM case_resolutions
+                ORDER BY pattern_length DESC, frequency DESC;
+                """
+            )
+            patterns = cur.fetchall()
+        
+        # Case-insensitive lookup; the first (longest, most frequent) pattern wins
+        lookup = {}
+        for pattern in patterns:
+            lookup.setdefault(pattern["original_pattern"].lower(), dict(pattern))
+        
+        # Alternation keeps the longest-first order, so longer patterns match before their prefixes
+        # Use word boundary matching to avoid partial replacements
+        compiled = None
+        if patterns:
+            compiled = re.compile(
+                r'\b(' + '|'.join(re.escape(p["original_pattern"]) for p in patterns) + r')\b',
+                re.IGNORECASE,
+            )
+        
+        _pattern_cache["compiled"] = compiled
+        _pattern_cache["lookup"] = lookup
+        _pattern_cache["loaded_at"] = time.monotonic()
+        _pattern_cache["version"] += 1
+        return compiled, lookup
+
+
+def learned_patterns_version() -> int:
     """
-    Apply all known corrections to an address based on learned patterns.
+    Version of the learned-pattern snapshot; changes whenever it is reloaded
+    (after store_resolution or PATTERN_CACHE_TTL), so results derived from
+    the patterns can be memoized per version.
+    """
+    _load_patterns()
+    return _pattern_cache["version"]
+
+
+def correct_address(address: str) -> tuple:
+    """
+    Apply all known corrections to an address without touching the database
+    (beyond loading the cached patterns).
     
-    Args:
-        address: The raw address to correct
+    All patterns are compiled into one alternation (cached in-process, see
+    _load_patterns) and applied in a single regex pass.
     
     Returns:
         Tuple of (corrected_address, list_of_corrections_applied)
     """
-    corrected = address
-    corrections_applied = []
+    combined, lookup = _load_patterns()
+    if combined is None:
+        return address, []
+    
+    hits = {}
+    def replace(match):
+        pattern = lookup[match.group(1).lower()]
+        hits.setdefault(pattern["original_pattern"], pattern)
+        return pattern["corrected_value"]
     
+    corrected = combined.sub(replace, address)
+    corrections_applied = [
+        {
+            "original": pattern["original_pattern"],
+            "corrected": pattern["corrected_value"],
+            "type": pattern["resolution_type"]
+        }
+        for pattern in hits.values()
+    ]
+    return corrected, corrections_applied
+
+
+def touch_resolutions(original_patterns: List[str]):
+    """Bump last_used_at for the given learned patterns in one UPDATE."""
+    if not original_patterns:
+        return
     with get_conn() as conn, conn.cursor() as cur:
-        # Get all known patterns, ordered by pattern length (longest first to avoid partial matches)
         cur.execute(
-            """
-            SELECT original_pattern, corrected_value, resolution_type
-            FROM case_resolutions
-            ORDER BY LENGTH(original_pattern) DESC, frequency DESC;
-            """
+            "UPDATE case_resolutions SET last_used_at = NOW() WHERE original_pattern = ANY(%s);",
+            (list(original_patterns),),
         )
-        patterns = cur.fetchall()
+
+
+def apply_learned_corrections(address: str) -> tuple:
+    """
+    Apply all known corrections to an address based on learned patterns,
+    then bump last_used_at for every hit in one UPDATE.
     
-    import re
-    for pattern in patterns:
-        original = pattern["original_pattern"]
-        replacement = pattern["corrected_value"]
-        
-        # Use word boundary matching to avoid partial replacements
-        regex_pattern = r'\b' + re.escape(original) + r'\b'
-        
-        if re.search(regex_pattern, corrected, re.IGNORECASE):
-            corrected = re.sub(regex_pattern, replacement, corrected, flags=re.IGNORECASE)
-            corrections_applied.append({
-                "original": original,
-                "corrected": replacement,
-                "type": pattern["resolution_type"]
-            })
-            
-            # Update last_used_at for this pattern
-            with get_conn() as conn, conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE case_resolutions SET last_used_at = NOW() WHERE original_pattern = %s;",
-                    (original,),
-                )
-                conn.commit()
+    Args:
+        address: The raw address to correct
     
+    Returns:
+        Tuple of (corrected_address, list_of_corrections_applied)
+    """
+    corrected, corrections_applied = correct_address(address)
+    touch_resolutions([c["original"] for c in corrections_applied])
     return corrected, corrections_applied
 
 
@@ -340,21 +785,54 @@ def get_resolution_stats() -> dict:
         Dictionary with total patterns, most used patterns, etc.
     """
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT COUNT(*) as total FROM case_resolutions;")
-        total = cur.fetchone()["total"]
-        
+        # Count and top 5 in one query (one round trip); jsonb comes back as a list of dicts
         cur.execute(
             """
-            SELECT original_pattern, corrected_value, frequency 
-            FROM case_resolutions 
-            ORDER BY frequency DESC 
-            LIMIT 5;
+            WITH top5 AS (
+                SELECT original_pattern, corrected_value, frequency
+                FROM case_resolutions
+                ORDER BY frequency DESC
+                LIMIT 5
+            )
+            SELECT
+                (SELECT COUNT(*) FROM case_resolutions) AS total,
+                COALESCE(
+                    (SELECT jsonb_agg(to_jsonb(top5) ORDER BY frequency DESC) FROM top5),
+                    '[]'::jsonb
+                ) AS top_patterns;
             """
         )
-        top_patterns = cur.fetchall()
+        row = cur.fetchone()
         
     return {
-        "total_patterns": total,
-        "top_patterns": [dict(p) for p in top_patterns]
+        "total_patterns": row["total"],
+        "top_patterns": row["top_patterns"]
     }
 
+
+# ========================
+# DOCUMENT CLASSIFICATION CACHE
+# ========================
+
+def get_cached_classification(text_hash: str) -> dict:
+    """Return a stored document classification for this OCR text hash, or None."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT result_json FROM classification_cache WHERE text_hash = %s;",
+            (text_hash,),
+        )
+        row = cur.fetchone()
+        return row["result_json"] if row else None
+
+
+def store_cached_classification(text_hash: str, model: str, result: dict):
+    """Store a document classification so other processes can reuse it."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO classification_cache (text_hash, model, result_json)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (text_hash) DO NOTHING;
+            """,
+            (text_hash, model, Json(result)),
+        )
@@ -7,12 +7,20 @@ Validates uploaded documents before automation starts:
 """
 
 import os
+import re
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, Tuple, List
 from openai import OpenAI
 
+from .db import get_cached_classification, store_cached_classification
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+CLASSIFIER_MODEL = "gpt-4o-mini"
+
 # Required fields for a complete case
 REQUIRED_FIELDS = [
     "citizen_name",
@@ -23,11 +31,55 @@ REQUIRED_FIELDS = [
     "landlord_name"
 ]
 
+# Placeholder/fallback values that mean a field was not really extracted
+_PLACEHOLDER_RE = re.compile(r'unknown|fallback|n/a|not found', re.IGNORECASE)
+
+# Accepted date formats
+_DATE_PATTERNS = (
+    re.compile(r'^\d{4}-\d{2}-\d{2}$'),    # YYYY-MM-DD
+    re.compile(r'^\d{2}\.\d{2}\.\d{4}$'),  # DD.MM.YYYY
+)
+
+# OCR text sent to the classifier (after normalization)
+CLASSIFIER_MAX_CHARS = 1500
+
+_WHITESPACE_RE = re.compile(r'[ \t\f\v\xa0]+')
+_NON_PRINTABLE_RE = re.compile(r'[^\x20-\x7e\xa0-\uffff\n]')
+_ALNUM_RE = re.compile(r'\w')
+
+
+def _normalize_ocr(text: str) -> str:
+    """
+    Compact OCR text for classification: drop non-printable characters,
+    collapse runs of whitespace, skip lines without any letters or digits
+    (rulers, dot leaders, scan noise) and keep the first CLASSIFIER_MAX_CHARS.
+    
+    Truncating is safe: the document type is given away by the title and
+    header lines at the top of the page, not by the rest of the form.
+    """
+    text = _NON_PRINTABLE_RE.sub("", text)
+    lines = []
+    size = 0
+    for line in text.splitlines():
+        line = _WHITESPACE_RE.sub(" ", line).strip()
+        if not _ALNUM_RE.search(line):
+            continue
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CLASSIFIER_MAX_CHARS:
+            break
+    return "\n".join(lines)[:CLASSIFIER_MAX_CHARS]
+
 
 def classify_document_type(ocr_text: str) -> Dict:
     """
     Use GPT to classify if the document is a valid address change document.
     
+    The OCR text is normalized first (see _normalize_ocr), which shortens the
+    prompt. Results are memoized by a hash of the normalized, lowercased text
+    and model, in process and in the classification_cache table, so
+    identical documents (up to whitespace and noise) reach OpenAI only once.
+    
     Returns:
         {
             "is_valid": True/False,
@@ -36,13 +88,44 @@ def classify_document_type(ocr_text: str) -> Dict:
             "reason": "Explanation"
         }
     """
+    text = _normalize_ocr(ocr_text)
+    text_hash = hashlib.blake2b(
+        f"{CLASSIFIER_MODEL}\0{text.lower()}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+    
+    try:
+        # Copy so callers can't mutate the cached result
+        return dict(_classify_cached(text_hash, text))
+    except Exception as e:
+        print(f"Document classification error: {e}")
+        return {
+            "is_valid": False,
+            "document_type": "unknown",
+            "confidence": "low",
+            "reason": f"Classification failed: {str(e)}"
+        }
+
+
+@lru_cache(maxsize=1024)
+def _classify_cached(text_hash: str, text: str) -> Dict:
+    """
+    Classify normalized OCR text, checking the shared DB cache first.
+    Raises on failure so errors are never memoized.
+    """
+    try:
+        cached = get_cached_classification(text_hash)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        print(f"Classification cache lookup failed: {e}")
+    
     prompt = f"""
 You are a document classification assistant for German public administration.
 
 Analyze the following OCR text and determine if it's a valid document for address registration:
 
 --- OCR TEXT ---
-{ocr_text[:3000]}
+{text}
 --- END ---
 
 Valid document types:
@@ -60,37 +143,34 @@ Return ONLY a valid JSON object:
 If the document appears to be completely unrelated (like a random PDF, invoice, or other document), set is_valid to false.
 """
     
+    response = client.chat.completions.create(
+        model=CLASSIFIER_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a document classifier. Return only valid JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.0,
+        max_tokens=300
+    )
+    
+    result_text = response.choices[0].message.content.strip()
+    
+    # Remove markdown code blocks if present
+    if result_text.startswith("```json"):
+        result_text = result_text[7:]
+    if result_text.startswith("```"):
+        result_text = result_text[3:]
+    if result_text.endswith("```"):
+        result_text = result_text[:-3]
+    
+    result = json.loads(result_text.strip())
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a document classifier. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            max_tokens=300
-        )
-        
-        result_text = response.choices[0].message.content.strip()
-        
-        # Remove markdown code blocks if present
-        if result_text.startswith("```json"):
-            result_text = result_text[7:]
-        if result_text.startswith("```"):
-            result_text = result_text[3:]
-        if result_text.endswith("```"):
-            result_text = result_text[:-3]
-        
-        return json.loads(result_text.strip())
-        
+        store_cached_classification(text_hash, CLASSIFIER_MODEL, result)
     except Exception as e:
-        print(f"Document classification error: {e}")
-        return {
-            "is_valid": False,
-            "document_type": "unknown",
-            "confidence": "low",
-            "reason": f"Classification failed: {str(e)}"
-        }
+        print(f"Classification cache store failed: {e}")
+    
+    return result
 
 
 def validate_documents(landlord_text: str, address_text: str) -> Dict:
@@ -107,15 +187,20 @@ def validate_documents(landlord_text: str, address_text: str) -> Dict:
     """
     errors = []
     
-    # Classify landlord document
-    landlord_result = classify_document_type(landlord_text)
+    # Both classifications are independent OpenAI round trips; overlap them
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        landlord_future = executor.submit(classify_document_type, landlord_text)
+        address_future = executor.submit(classify_document_type, address_text)
+        landlord_result = landlord_future.result()
+        address_result = address_future.result()
+    
+    # Check landlord document
     if not landlord_result.get("is_valid"):
         errors.append(f"Landlord document invalid: {landlord_result.get('reason', 'Unknown error')}")
     elif landlord_result.get("document_type") not in ["landlord_confirmation", "address_form"]:
         errors.append(f"First document is not a recognized address change document")
     
-    # Classify address form
-    address_result = classify_document_type(address_text)
+    # Check address form
     if not address_result.get("is_valid"):
         errors.append(f"Address form invalid: {address_result.get('reason', 'Unknown error')}")
     elif address_result.get("document_type") not in ["landlord_confirmation", "address_form"]:
@@ -158,8 +243,7 @@ def check_data_completeness(parsed_data: Dict) -> Dict:
             continue
         
         # Check for placeholder/fallback values
-        value_lower = str(value).lower()
-        if any(placeholder in value_lower for placeholder in ["unknown", "fallback", "n/a", "not found"]):
+        if _PLACEHOLDER_RE.search(str(value)):
             invalid_fields.append(field)
     
     # Validate date formats
@@ -177,13 +261,8 @@ def check_data_completeness(parsed_data: Dict) -> Dict:
 
 def _is_valid_date(date_str: str) -> bool:
     """Check if a date string is in a valid format."""
-    import re
-    # Accept YYYY-MM-DD or DD.MM.YYYY
-    patterns = [
-        r'^\d{4}-\d{2}-\d{2}$',  # YYYY-MM-DD
-        r'^\d{2}\.\d{2}\.\d{4}$',  # DD.MM.YYYY
-    ]
-    return any(re.match(pattern, str(date_str)) for pattern in patterns)
+    value = str(date_str)
+    return any(pattern.match(value) for pattern in _DATE_PATTERNS)
 
 
 def validate_case_data(landlord_text: str, address_text: str, parsed_data: Dict) -> Dict:
@@ -1,20 +1,31 @@
 """
 Email Listener Service for Address Change Automation
 
-This service polls a Gmail inbox for new address change request emails,
-extracts PDF attachments, creates cases, and triggers the automation workflow.
+This service watches a Gmail inbox (IMAP IDLE push on one persistent
+connection) for new address change request emails, extracts PDF attachments,
+creates cases, and triggers the automation workflow.
 """
 
 import os
+import re
+import html
 import sys
 import time
 import email
 import imaplib
 import logging
+import socket
+import smtplib
+import threading
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, wait
 from email.header import decode_header
+from email.parser import BytesHeaderParser
+from string import Template
 from pathlib import Path
-from datetime import datetime
 
 # Configure logging
 logging.basicConfig(
@@ -29,11 +40,37 @@ EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS", "")
 EMAIL_APP_PASSWORD = os.getenv("EMAIL_APP_PASSWORD", "")
 BACKEND_URL = os.getenv("BACKEND_URL", "http://backend:8000")
 IMAP_SERVER = "imap.gmail.com"
-POLL_INTERVAL = 10  # seconds
+POLL_INTERVAL = 10  # seconds, only used when the server has no IDLE support
+IDLE_TIMEOUT = 9 * 60  # seconds; re-issue IDLE well before servers drop it (RFC 2177: 29 min)
+RECONNECT_DELAY = 5  # seconds to wait before logging in again after a dropped connection
+FETCH_BATCH_SIZE = 20  # messages per UID FETCH
+MAX_WORKERS = int(os.getenv("EMAIL_WORKERS", "8"))  # emails handled in parallel
+# Only download full messages whose subject has an address change keyword.
+# Saves bandwidth on busy inboxes, but skips fuzzy/LLM detection on the body.
+SUBJECT_FAST_PATH_ONLY = os.getenv("SUBJECT_FAST_PATH_ONLY", "false").lower() == "true"
+
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="email")
+
+# Keep-alive session for backend calls. Only connection failures are retried:
+# submit-case is not idempotent, so a request that reached the server is never resent.
+_SESSION = requests.Session()
+_SESSION.mount(
+    BACKEND_URL,
+    HTTPAdapter(pool_maxsize=8, max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)),
+)
 
 # Upload directory (must match backend)
 UPLOAD_DIR = Path("/app/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+_UPLOAD_PREFIX = f"{UPLOAD_DIR}/"
+
+# UID of a message in a FETCH response line, e.g. b'1 (UID 123 RFC822 {4521}'
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+
+_HEADER_PARSER = BytesHeaderParser()
+
+# Address inside angle brackets, e.g. "Max Muster <max@example.com>"
+_ADDR_RE = re.compile(r'<([^>]+)>')
 
 # Keywords to detect address change requests (case-insensitive)
 # Supports both English and German keywords
@@ -52,11 +89,18 @@ KEYWORDS = [
     "meldebescheinigung",  # German: registration certificate
 ]
 
+# All keywords as one case-insensitive alternation: a single scan of subject
+# and body in place, instead of one substring search per keyword on a lowered copy
+_KEYWORD_RE = re.compile('|'.join(re.escape(keyword) for keyword in KEYWORDS), re.IGNORECASE)
+
 
 def decode_mime_header(header_value):
     """Decode MIME-encoded email header."""
     if not header_value:
         return ""
+    # Most headers contain no RFC 2047 encoded words; skip decode_header's parsing for them
+    if isinstance(header_value, str) and '=?' not in header_value:
+        return header_value
     decoded_parts = decode_header(header_value)
     result = []
     for part, charset in decoded_parts:
@@ -67,24 +111,34 @@ def decode_mime_header(header_value):
     return ' '.join(result)
 
 
-def get_email_body(msg):
-    """Extract text body from email message."""
-    body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_type = part.get_content_type()
-            if content_type == "text/plain":
-                try:
-                    body = part.get_payload(decode=True).decode('utf-8', errors='replace')
-                    break
-                except:
-                    pass
-    else:
-        try:
-            body = msg.get_payload(decode=True).decode('utf-8', errors='replace')
-        except:
-            pass
-    return body
+def parse_email(msg):
+    """
+    Walk the MIME tree once and return (text body, PDF attachments).
+    PDF attachments are (filename, part) pairs; nothing is written to disk yet.
+    """
+    body = None
+    pdf_parts = []
+    multipart = msg.is_multipart()
+    
+    for part in msg.walk():
+        # Body: the first text/plain part (or the whole payload of a single-part mail)
+        if body is None and (not multipart or part.get_content_type() == "text/plain"):
+            try:
+                body = part.get_payload(decode=True).decode('utf-8', errors='replace')
+            except:
+                pass
+        
+        content_disposition = str(part.get("Content-Disposition", ""))
+        if "attachment" in content_disposition:
+            filename = part.get_filename()
+            if filename:
+                filename = decode_mime_header(filename)
+                
+                # Only process PDF files
+                if filename.lower().endswith('.pdf'):
+                    pdf_parts.append((filename, part))
+    
+    return body or "", pdf_parts
 
 
 def is_address_change_email(subject, body):
@@ -99,14 +153,15 @@ def is_address_change_email(subject, body):
     - is_high_confidence: True if we should send rejection emails for invalid submissions
                           False if we should skip silently (might be spam/unrelated)
     """
-    text = f"{subject} {body}".lower()
-    
     # Step 1: Exact keyword matching - HIGH CONFIDENCE
     # These are explicit address change terms that users would intentionally use
-    for keyword in KEYWORDS:
-        if keyword.lower() in text:
-            logger.info(f"Matched keyword (exact): '{keyword}' - HIGH confidence")
-            return True, True  # Match with HIGH confidence
+    match = _KEYWORD_RE.search(subject) or _KEYWORD_RE.search(body)
+    if match:
+        logger.debug("Matched keyword (exact): '%s' - HIGH confidence", match.group(0).lower())
+        return True, True  # Match with HIGH confidence
+    
+    # Only the fuzzy step needs a lowered copy of the whole text
+    text = f"{subject} {body}".lower()
     
     # Step 2: Fuzzy matching for typos using difflib - LOW CONFIDENCE
     # Only match multi-word phrases to avoid false positives from single words
@@ -134,7 +189,7 @@ def is_address_change_email(subject, body):
         # Higher cutoff (0.85) to reduce false positives
         matches = difflib.get_close_matches(sequence.lower(), expected_patterns, n=1, cutoff=0.85)
         if matches:
-            logger.info(f"Fuzzy matched: '{sequence}' → '{matches[0]}' - LOW confidence")
+            logger.info("Fuzzy matched: '%s' → '%s' - LOW confidence", sequence, matches[0])
             return True, False  # Match with LOW confidence (don't send rejection)
     
     # Step 3: LLM classification for edge cases - LOW CONFIDENCE
@@ -182,68 +237,87 @@ Consider:
             return False, False
             
     except Exception as e:
-        logger.warning(f"LLM classification failed: {e}")
+        logger.warning("LLM classification failed: %s", e)
         return False, False
 
 
 
-def extract_attachments(msg, case_prefix):
-    """Extract PDF attachments from email and save to upload directory."""
+def save_attachments(pdf_parts, case_prefix):
+    """Save PDF attachments (from parse_email) to the upload directory."""
     attachments = []
+    # Nanosecond stamp + index: unique even for two mails within the same second
+    timestamp = f"{time.time_ns():x}"
     
-    for part in msg.walk():
-        content_disposition = str(part.get("Content-Disposition", ""))
+    for i, (filename, part) in enumerate(pdf_parts):
+        filepath = f"{_UPLOAD_PREFIX}{timestamp}_{i}_{case_prefix}_{filename}"
         
-        if "attachment" in content_disposition:
-            filename = part.get_filename()
-            if filename:
-                filename = decode_mime_header(filename)
-                
-                # Only process PDF files
-                if filename.lower().endswith('.pdf'):
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    safe_filename = f"{timestamp}_{case_prefix}_{filename}"
-                    filepath = UPLOAD_DIR / safe_filename
-                    
-                    try:
-                        with open(filepath, 'wb') as f:
-                            f.write(part.get_payload(decode=True))
-                        attachments.append(str(filepath))
-                        logger.info(f"Saved attachment: {filepath}")
-                    except Exception as e:
-                        logger.error(f"Failed to save attachment {filename}: {e}")
+        try:
+            # Decode straight into the file; drop the decoded copy before the next part
+            payload = part.get_payload(decode=True)
+            with open(filepath, 'wb') as f:
+                f.write(payload)
+            del payload
+            attachments.append(filepath)
+            logger.info("Saved attachment: %s", filepath)
+        except Exception as e:
+            logger.error("Failed to save attachment %s: %s", filename, e)
     
     return attachments
 
 
-def send_rejection_email(to_email: str, errors: list, help_text: str):
-    """Send rejection email to citizen when documents are invalid."""
-    import smtplib
-    import socket
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    
-    logger.info(f"Attempting to send rejection email to {to_email}...")
+# One SMTP session shared by all rejection emails (lazy, re-opened when dropped)
+_smtp = None
+_smtp_lock = threading.Lock()
+
+
+def _get_smtp():
+    """Return a logged-in SMTP connection, reconnecting if the old one went stale."""
+    global _smtp
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        _close_smtp()
     
+    # Send via SMTP with STARTTLS (port 587 works better in Docker)
+    logger.info("Connecting to smtp.gmail.com:587...")
+    smtp = smtplib.SMTP('smtp.gmail.com', 587, timeout=30)
     try:
-        # Create email message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = 'Address Change Request - Documents Invalid'
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = to_email
-        
-        error_list = "\n".join(f"• {err}" for err in errors)
-        
-        # Plain text version
-        text_body = f"""Dear Citizen,
+        smtp.ehlo()
+        smtp.starttls()
+        smtp.ehlo()
+        logger.info("SMTP connection established, logging in...")
+        smtp.login(EMAIL_ADDRESS, EMAIL_APP_PASSWORD)
+    except Exception:
+        smtp.close()
+        raise
+    _smtp = smtp
+    return _smtp
+
+
+def _close_smtp():
+    """Drop the shared SMTP connection."""
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except Exception:
+            _smtp.close()
+        _smtp = None
+
+
+# Rejection email bodies, parsed once; only the errors and help text vary
+_REJECTION_TEXT = Template("""Dear Citizen,
 
 Thank you for submitting your address change request.
 
 Unfortunately, we could not process your documents because:
 
-{error_list}
+$error_list
 
-{help_text}
+$help_text
 
 What to do next:
 1. Ensure you have the correct documents:
@@ -255,10 +329,9 @@ Need help? Visit our chatbot assistant for guidance.
 
 Best regards,
 Address Registration Office
-"""
-        
-        # HTML version
-        html_body = f"""
+""")
+
+_REJECTION_HTML = Template("""
 <html>
 <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
     <h2 style="color: #dc2626;">Documents Could Not Be Processed</h2>
@@ -270,11 +343,11 @@ Address Registration Office
     <p>Unfortunately, we could not process your documents because:</p>
     
     <ul style="background: #fef2f2; padding: 15px 30px; border-left: 4px solid #dc2626; margin: 20px 0;">
-        {"".join(f"<li>{err}</li>" for err in errors)}
+        $error_items
     </ul>
     
     <p style="background: #f0f9ff; padding: 15px; border-left: 4px solid #0284c7; margin: 20px 0;">
-        {help_text}
+        $help_text
     </p>
     
     <h3>What to do next:</h3>
@@ -294,43 +367,104 @@ Address Registration Office
     <p style="color: #6b7280; font-size: 12px;">Address Registration Office</p>
 </body>
 </html>
-"""
-        
-        msg.attach(MIMEText(text_body, 'plain'))
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        # Set socket timeout
-        socket.setdefaulttimeout(30)
-        
-        # Send via SMTP with STARTTLS (port 587 works better in Docker)
-        logger.info(f"Connecting to smtp.gmail.com:587...")
-        with smtplib.SMTP('smtp.gmail.com', 587, timeout=30) as smtp:
-            smtp.ehlo()
-            smtp.starttls()
-            smtp.ehlo()
-            logger.info("SMTP connection established, logging in...")
-            smtp.login(EMAIL_ADDRESS, EMAIL_APP_PASSWORD)
-            logger.info("Logged in, sending email...")
-            smtp.sendmail(EMAIL_ADDRESS, to_email, msg.as_string())
+""")
+
+
+def send_rejection_email(to_email: str, errors: list, help_text: str):
+    """Send rejection email to citizen when documents are invalid."""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
+    logger.info("Attempting to send rejection email to %s...", to_email)
+    
+    try:
+        # Create email message
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = 'Address Change Request - Documents Invalid'
+        msg['From'] = EMAIL_ADDRESS
+        msg['To'] = to_email
         
-        logger.info(f"✅ Successfully sent rejection email to {to_email}")
+        error_list = "\n".join(f"• {err}" for err in errors)
+        # Error texts come from OCR/validation output; escape them for the HTML part
+        error_items = "".join(f"<li>{html.escape(str(err))}</li>" for err in errors)
+        
+        msg.attach(MIMEText(_REJECTION_TEXT.substitute(error_list=error_list, help_text=help_text), 'plain'))
+        msg.attach(MIMEText(_REJECTION_HTML.substitute(error_items=error_items, help_text=html.escape(help_text)), 'html'))
+        
+        # Reuse the shared session; only sendmail runs per rejection.
+        # Retry once on a fresh connection if the server dropped us mid-send.
+        with _smtp_lock:
+            try:
+                _get_smtp().sendmail(EMAIL_ADDRESS, to_email, msg.as_string())
+            except smtplib.SMTPServerDisconnected:
+                _close_smtp()
+                _get_smtp().sendmail(EMAIL_ADDRESS, to_email, msg.as_string())
+        
+        logger.info("✅ Successfully sent rejection email to %s", to_email)
         return True
         
     except socket.timeout:
-        logger.error(f"❌ SMTP timeout when sending to {to_email}")
+        logger.error("❌ SMTP timeout when sending to %s", to_email)
         return False
     except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"❌ SMTP auth failed: {e}")
+        logger.error("❌ SMTP auth failed: %s", e)
         return False
     except Exception as e:
-        logger.error(f"❌ Failed to send rejection email to {to_email}: {type(e).__name__}: {e}")
+        logger.error("❌ Failed to send rejection email to %s: %s: %s", to_email, type(e).__name__, e)
         return False
 
 
+class _MultipartBody:
+    """
+    multipart/form-data body that streams file parts from disk in chunks.
+    requests would read every file into memory and then join the whole body
+    once more; this only ever holds one chunk. Content-Length is known up
+    front (from the file sizes), so the upload is not chunk-encoded.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, data, files):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._parts = []
+        for name, value in data.items():
+            self._parts.append((
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            ).encode('utf-8'))
+        for name, (filename, fileobj, content_type) in files.items():
+            self._parts.append((
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'
+            ).encode('utf-8'))
+            self._parts.append(fileobj)
+            self._parts.append(b'\r\n')
+        self._parts.append(f'--{self.boundary}--\r\n'.encode('utf-8'))
+        self.length = sum(
+            len(part) if isinstance(part, bytes) else os.fstat(part.fileno()).st_size
+            for part in self._parts
+        )
+
+    def __len__(self):
+        # requests sends Content-Length (instead of chunked encoding) for sized iterables
+        return self.length
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                while True:
+                    chunk = part.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+
 def create_case_from_email(sender_email, attachments):
     """Create a new case via the backend API. Returns (case_id, error_info) tuple."""
     if len(attachments) < 2:
-        logger.warning(f"Email from {sender_email} has {len(attachments)} PDFs, need at least 2")
+        logger.warning("Email from %s has %s PDFs, need at least 2", sender_email, len(attachments))
         return None, {"errors": ["Not enough PDF attachments. Please attach 2 documents."]}
     
     # Prepare form data for the submit-case endpoint
@@ -345,86 +479,124 @@ def create_case_from_email(sender_email, attachments):
                 'source': 'email',  # Mark as email submission for analytics
             }
             
-            response = requests.post(
+            body = _MultipartBody(data, files)
+            response = _SESSION.post(
                 f"{BACKEND_URL}/submit-case",
-                data=data,
-                files=files,
+                data=body,
+                headers={'Content-Type': body.content_type},
                 timeout=120  # Increased for OCR + validation
             )
             
             if response.status_code == 200:
                 result = response.json()
                 case_id = result.get('case_id')
-                logger.info(f"Created case {case_id} from email by {sender_email}")
+                logger.info("Created case %s from email by %s", case_id, sender_email)
                 return case_id, None
             elif response.status_code == 400:
                 # Document validation failed
                 error_info = response.json()
-                logger.warning(f"Document validation failed for {sender_email}: {error_info}")
+                logger.warning("Document validation failed for %s: %s", sender_email, error_info)
                 return None, error_info
             else:
-                logger.error(f"Failed to create case: {response.status_code} - {response.text}")
+                logger.error("Failed to create case: %s - %s", response.status_code, response.text)
                 return None, {"errors": [f"Server error: {response.status_code}"]}
                 
     except Exception as e:
-        logger.error(f"Error creating case: {e}")
+        logger.error("Error creating case: %s", e)
         return None, {"errors": [f"Connection error: {str(e)}"]}
 
 
 
-def process_email(mail, email_id):
-    """Process a single email: extract info, validate, create case or send rejection."""
+def fetch_all(mail, email_ids):
+    """
+    Fetch several messages with one UID FETCH command.
+    Returns {uid: raw RFC822 bytes}.
+    """
+    _, msg_data = mail.uid('FETCH', b','.join(email_ids), '(RFC822)')
+    raw_map = {}
+    for item in msg_data:
+        # Message parts come back as (b'1 (UID 123 RFC822 {size}', raw_bytes); skip the b')' closers
+        if isinstance(item, tuple):
+            match = _FETCH_UID_RE.search(item[0])
+            if match:
+                raw_map[match.group(1)] = item[1]
+    return raw_map
+
+
+def fetch_subjects(mail, email_ids):
+    """
+    Fetch only the Subject header of several messages (one command, PEEK so
+    nothing is marked read). Returns {uid: decoded subject}.
+    """
+    _, msg_data = mail.uid('FETCH', b','.join(email_ids), '(BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
+    subjects = {}
+    for item in msg_data:
+        if isinstance(item, tuple):
+            match = _FETCH_UID_RE.search(item[0])
+            if match:
+                headers = _HEADER_PARSER.parsebytes(item[1])
+                subjects[match.group(1)] = decode_mime_header(headers.get('Subject', ''))
+    return subjects
+
+
+def mark_seen(mail, email_ids):
+    """Flag several messages as read with one UID STORE command."""
+    if email_ids:
+        mail.uid('STORE', b','.join(email_ids), '+FLAGS', '\\Seen')
+
+
+def handle_message(email_id, raw_email, seen_ids):
+    """
+    Process a single email: extract info, validate, create case or send rejection.
+    Messages that are done with are added to seen_ids, to be flagged read in one batch.
+    Runs on EXECUTOR threads, so it must not use the IMAP connection.
+    """
     try:
-        # Fetch the email
-        _, msg_data = mail.fetch(email_id, '(RFC822)')
-        raw_email = msg_data[0][1]
         msg = email.message_from_bytes(raw_email)
         
         # Extract sender
         sender = decode_mime_header(msg.get('From', ''))
         # Extract just the email address
-        if '<' in sender and '>' in sender:
-            sender_email = sender.split('<')[1].split('>')[0]
-        else:
-            sender_email = sender.strip()
+        match = _ADDR_RE.search(sender)
+        sender_email = match.group(1) if match else sender.strip()
         
         # Extract subject
         subject = decode_mime_header(msg.get('Subject', ''))
         
-        # Extract body
-        body = get_email_body(msg)
+        # Extract body and PDF attachments in one pass over the MIME parts
+        body, pdf_parts = parse_email(msg)
         
-        logger.info(f"Processing email from: {sender_email}, Subject: {subject}")
+        logger.info("Processing email from: %s, Subject: %s", sender_email, subject)
         
         # Check if it's an address change email
         is_address_change, is_high_confidence = is_address_change_email(subject, body)
         
         if not is_address_change:
-            logger.info(f"Email does not match address change criteria, skipping silently")
+            logger.info("Email does not match address change criteria, skipping silently")
             # Mark as read so we don't keep checking it
-            mail.store(email_id, '+FLAGS', '\\Seen')
+            seen_ids.append(email_id)
             return False
         
-        # Extract PDF attachments
+        # Save PDF attachments
         case_prefix = sender_email.split('@')[0][:10]
-        attachments = extract_attachments(msg, case_prefix)
+        attachments = save_attachments(pdf_parts, case_prefix)
         
         if len(attachments) < 2:
-            logger.warning(f"Not enough PDF attachments ({len(attachments)}), need at least 2")
+            logger.warning("Not enough PDF attachments (%s), need at least 2", len(attachments))
             
             # Only send rejection email if we're confident this was an actual address change request
             if is_high_confidence:
-                logger.info(f"High confidence match - sending rejection email for missing attachments")
+                logger.info("High confidence match - sending rejection email for missing attachments")
                 send_rejection_email(
                     sender_email,
                     ["You did not attach enough PDF documents. We need 2 documents."],
                     "Please attach both: 1) Wohnungsgeberbestätigung (Landlord Confirmation) and 2) Anmeldeformular (Address Registration Form)"
                 )
             else:
-                logger.info(f"Low confidence match - skipping silently (likely spam or unrelated email)")
+                logger.info("Low confidence match - skipping silently (likely spam or unrelated email)")
             
             # Mark email as read
-            mail.store(email_id, '+FLAGS', '\\Seen')
+            seen_ids.append(email_id)
             return False
         
         # Create case via API (includes document validation)
@@ -432,8 +604,8 @@ def process_email(mail, email_id):
         
         if case_id:
             # Success - case created and automation started
-            mail.store(email_id, '+FLAGS', '\\Seen')
-            logger.info(f"Successfully processed email, created {case_id}")
+            seen_ids.append(email_id)
+            logger.info("Successfully processed email, created %s", case_id)
             return True
         elif error_info:
             # Document validation failed
@@ -443,82 +615,185 @@ def process_email(mail, email_id):
                 help_text = error_info.get("help", "Please ensure you upload valid address change documents.")
                 email_sent = send_rejection_email(sender_email, errors, help_text)
                 if email_sent:
-                    logger.info(f"Rejection email sent to {sender_email}")
+                    logger.info("Rejection email sent to %s", sender_email)
                 else:
-                    logger.warning(f"Could not send rejection email to {sender_email}")
+                    logger.warning("Could not send rejection email to %s", sender_email)
             else:
-                logger.info(f"Low confidence match with validation errors - skipping silently")
+                logger.info("Low confidence match with validation errors - skipping silently")
             
             # Mark email as read so we don't process again
-            mail.store(email_id, '+FLAGS', '\\Seen')
+            seen_ids.append(email_id)
             return False
         
         return False
         
     except Exception as e:
-        logger.error(f"Error processing email {email_id}: {e}")
+        logger.error("Error processing email %s: %s", email_id, e)
         return False
 
-def poll_inbox(first_poll=False):
-    """Connect to Gmail and check for new emails."""
-    if not EMAIL_ADDRESS or not EMAIL_APP_PASSWORD:
-        logger.error("Email credentials not configured!")
-        return
-    
+def connect_inbox():
+    """Log in to Gmail and select INBOX. Returns the connected IMAP client."""
+    mail = imaplib.IMAP4_SSL(IMAP_SERVER)
+    mail.login(EMAIL_ADDRESS, EMAIL_APP_PASSWORD)
+    mail.select('INBOX')
+    logger.info("✅ Connected to Gmail IMAP successfully")
+    return mail
+
+
+def submit_batch(batch, raw_map):
+    """
+    Hand fetched messages to the worker pool. Messages are independent and
+    mostly wait on the backend (OCR) or SMTP, so they run in parallel; only
+    the main thread touches the IMAP connection. Returns (futures, seen_ids).
+    """
+    seen_ids = []
+    futures = []
+    for email_id in batch:
+        if email_id in raw_map:
+            futures.append(EXECUTOR.submit(handle_message, email_id, raw_map[email_id], seen_ids))
+        else:
+            logger.error("Email %s missing from FETCH response", email_id)
+    return futures, seen_ids
+
+
+def finish_batch(mail, futures, seen_ids):
+    """Wait for a submitted batch, then flag its handled messages read in one STORE."""
     try:
-        # Connect to Gmail IMAP
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER)
-        mail.login(EMAIL_ADDRESS, EMAIL_APP_PASSWORD)
-        
-        # Only log connection on first poll
-        if first_poll:
-            logger.info("✅ Connected to Gmail IMAP successfully")
-        
-        mail.select('INBOX')
-        
-        # Search for unread emails
-        _, message_numbers = mail.search(None, 'UNSEEN')
-        email_ids = message_numbers[0].split()
-        
-        if email_ids:
-            logger.info(f"📧 Found {len(email_ids)} unread email(s)")
-            
-            for email_id in email_ids:
-                process_email(mail, email_id)
-        # Don't log "No unread emails" - too noisy
-        
-        mail.close()
-        mail.logout()
+        wait(futures)
+    finally:
+        mark_seen(mail, seen_ids)
+
+
+def poll_inbox(mail):
+    """Process all unread emails in the selected mailbox."""
+    # UIDs stay valid for the whole session, unlike message sequence numbers
+    _, message_numbers = mail.uid('SEARCH', None, 'UNSEEN')
+    email_ids = message_numbers[0].split()
+    
+    if email_ids and SUBJECT_FAST_PATH_ONLY:
+        subjects = fetch_subjects(mail, email_ids)
+        matching, skipped = [], []
+        for uid in email_ids:
+            (matching if _KEYWORD_RE.search(subjects.get(uid, "")) else skipped).append(uid)
+        if skipped:
+            logger.info("Skipping %s email(s) without address change keywords in the subject", len(skipped))
+            mark_seen(mail, skipped)
+        email_ids = matching
+    
+    if email_ids:
+        logger.info("📧 Found %s unread email(s)", len(email_ids))
         
-    except imaplib.IMAP4.error as e:
-        logger.error(f"IMAP error: {e}")
-    except Exception as e:
-        logger.error(f"Error polling inbox: {e}")
+        # Fetch in chunks: one round trip per chunk, bounded memory for big backlogs.
+        # While the workers handle one chunk, this thread already fetches the next,
+        # so IMAP transfer overlaps with the backend (OCR) and SMTP waits.
+        pending = None
+        try:
+            for i in range(0, len(email_ids), FETCH_BATCH_SIZE):
+                batch = email_ids[i:i + FETCH_BATCH_SIZE]
+                raw_map = fetch_all(mail, batch)
+                if pending:
+                    finish_batch(mail, *pending)
+                    pending = None
+                pending = submit_batch(batch, raw_map)
+        finally:
+            if pending:
+                finish_batch(mail, *pending)
+    # Don't log "No unread emails" - too noisy
+
+
+def wait_for_new_mail(mail, timeout=IDLE_TIMEOUT):
+    """
+    Block in IMAP IDLE (RFC 2177) until the server announces new mail or
+    the timeout expires. Returns True if an EXISTS notification arrived.
+    
+    imaplib has no IDLE command, so it is issued by hand: send IDLE, read
+    untagged responses, then end it with DONE and read the tagged completion.
+    Lines are read through mail.readline() so responses already buffered in
+    mail.file are seen at once; the timeout is a timer that sends DONE, which
+    makes the server complete the command and wakes the read loop.
+    """
+    # Own tag prefix, so it cannot collide with imaplib's generated tags
+    tag = ("IDLE" + uuid.uuid4().hex[:8].upper()).encode()
+    mail.send(tag + b" IDLE\r\n")
+    response = mail.readline()
+    if not response.startswith(b"+"):
+        raise imaplib.IMAP4.abort(f"IDLE rejected: {response!r}")
+    
+    done_lock = threading.Lock()
+    
+    def send_done():
+        # Sent once, by whichever of the timer and the read loop comes first
+        if done_lock.acquire(blocking=False):
+            try:
+                mail.send(b"DONE\r\n")
+            except OSError:
+                pass  # connection gone; the read loop reports it
+    
+    timer = threading.Timer(timeout, send_done)
+    timer.daemon = True
+    timer.start()
+    new_mail = False
+    try:
+        while True:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("Connection closed during IDLE")
+            if line.startswith(tag):
+                break
+            if not new_mail and line.rstrip().endswith(b"EXISTS"):
+                new_mail = True
+                send_done()
+    finally:
+        timer.cancel()
+    return new_mail
 
 
 def main():
-    """Main loop - continuously poll inbox."""
+    """Main loop - keep one IMAP session open and wait for new mail with IDLE."""
     logger.info("=" * 50)
     logger.info("📬 Email Listener Service Started")
-    logger.info(f"Monitoring inbox: {EMAIL_ADDRESS}")
-    logger.info(f"Poll interval: {POLL_INTERVAL} seconds")
-    logger.info(f"Keywords: {', '.join(KEYWORDS)}")
+    logger.info("Monitoring inbox: %s", EMAIL_ADDRESS)
+    logger.info("Keywords: %s", ', '.join(KEYWORDS))
     logger.info("=" * 50)
     
     # Initial delay to let backend start
     time.sleep(5)
     
-    # First poll with connection logging
-    first_poll = True
+    mail = None
     
     while True:
+        if not EMAIL_ADDRESS or not EMAIL_APP_PASSWORD:
+            logger.error("Email credentials not configured!")
+            time.sleep(POLL_INTERVAL)
+            continue
+        
         try:
-            poll_inbox(first_poll=first_poll)
-            first_poll = False  # Only log connection once
+            if mail is None:
+                mail = connect_inbox()
+                if 'IDLE' not in mail.capabilities:
+                    logger.info("Server has no IDLE support, polling every %s seconds", POLL_INTERVAL)
+            
+            # Catch up on anything that arrived before (or while) we were idling
+            poll_inbox(mail)
+            
+            if 'IDLE' in mail.capabilities:
+                wait_for_new_mail(mail)
+            else:
+                time.sleep(POLL_INTERVAL)
+                mail.noop()
+                
+        except (imaplib.IMAP4.abort, OSError) as e:
+            # Dropped connection (server timeout, network blip): log in again
+            logger.warning("IMAP connection lost: %s. Reconnecting...", e)
+            mail = None
+            time.sleep(RECONNECT_DELAY)
+        except imaplib.IMAP4.error as e:
+            logger.error("IMAP error: %s", e)
+            mail = None
+            time.sleep(RECONNECT_DELAY)
         except Exception as e:
-            logger.error(f"Unexpected error in main loop: {e}")
-        
-        time.sleep(POLL_INTERVAL)
+            logger.error("Unexpected error in main loop: %s", e)
+            time.sleep(RECONNECT_DELAY)
 
 
 if __name__ == "__main__":
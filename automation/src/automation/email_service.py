@@ -2,28 +2,17 @@
 Email service using SendGrid
 """
 import os
+import mmap
 import base64
-from sendgrid import SendGridAPIClient
+from string import Template
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
 from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
 
 
-def send_certificate_email(to_email: str, pdf_path: str, case_id: str, citizen_name: str) -> bool:
-    """
-    Send certificate email with PDF attachment using SendGrid
-    """
-    sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
-    sender_email = os.getenv("SENDER_EMAIL", "noreply@addresschange.com")
-    
-    if not sendgrid_api_key:
-        print("CRITICAL ERROR: SENDGRID_API_KEY not set in environment variables. Email cannot be sent.")
-        return False
-    
-    try:
-        message = Mail(
-            from_email=sender_email,
-            to_emails=to_email,
-            subject=f'Address Change Confirmation - {case_id}',
-            html_content=f'''
+# Certificate email body, parsed once; only the name and case id vary per email
+_CERTIFICATE_HTML = Template('''
             <html>
             <body style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; line-height: 1.6; color: #333; background-color: #f3f4f6; padding: 20px;">
                 <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 8px; overflow: hidden; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);">
@@ -36,13 +25,13 @@ def send_certificate_email(to_email: str, pdf_path: str, case_id: str, citizen_n
 
                     <!-- Content -->
                     <div style="padding: 40px;">
-                        <p style="font-size: 16px; margin-bottom: 20px;">Dear {citizen_name},</p>
+                        <p style="font-size: 16px; margin-bottom: 20px;">Dear $citizen_name,</p>
                         
                         <p>We are pleased to inform you that your address change request has been <strong>successfully processed</strong> and officially registered.</p>
 
                         <div style="background-color: #eff6ff; border-left: 4px solid #1e40af; padding: 20px; margin: 25px 0; border-radius: 4px;">
                             <p style="margin: 0; font-size: 14px; text-transform: uppercase; color: #1e40af; font-weight: bold; letter-spacing: 0.5px;">Reference Number</p>
-                            <p style="margin: 5px 0 0 0; font-size: 18px; color: #111; font-family: monospace;">{case_id}</p>
+                            <p style="margin: 5px 0 0 0; font-size: 18px; color: #111; font-family: monospace;">$case_id</p>
                         </div>
                         
                         <p>Your official <strong>Address Change Certificate</strong> (Meldebescheinigung) is attached to this email. This document serves as legal proof of your new residence.</p>
@@ -65,36 +54,83 @@ def send_certificate_email(to_email: str, pdf_path: str, case_id: str, citizen_n
                 </div>
             </body>
             </html>
-            '''
+            ''')
+
+_SENDGRID_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
+
+# Keep-alive session for the SendGrid API: the TLS handshake is paid once per
+# pooled connection instead of once per email (SendGridAPIClient opens a new
+# connection for every send). Sized for the certificate email workers.
+_SESSION = requests.Session()
+_SESSION.mount("https://api.sendgrid.com", HTTPAdapter(pool_maxsize=int(os.getenv("CERT_EMAIL_WORKERS", "4"))))
+
+# Attachment headers are the same for every certificate
+_PDF_FILE_TYPE = FileType('application/pdf')
+_ATTACHMENT_DISPOSITION = Disposition('attachment')
+
+
+def send_certificate_email(to_email: str, pdf_path: str, case_id: str, citizen_name: str,
+                           pdf_bytes: Optional[bytes] = None) -> bool:
+    """
+    Send certificate email with PDF attachment using SendGrid
+    
+    pdf_bytes, when the caller still holds the rendered PDF, is attached
+    directly instead of reading pdf_path back from disk.
+    """
+    sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
+    sender_email = os.getenv("SENDER_EMAIL", "noreply@addresschange.com")
+    
+    if not sendgrid_api_key:
+        print("CRITICAL ERROR: SENDGRID_API_KEY not set in environment variables. Email cannot be sent.")
+        return False
+    
+    try:
+        message = Mail(
+            from_email=sender_email,
+            to_emails=to_email,
+            subject=f'Address Change Confirmation - {case_id}',
+            html_content=_CERTIFICATE_HTML.substitute(citizen_name=citizen_name, case_id=case_id)
         )
         
         # Attach PDF
-        with open(pdf_path, 'rb') as f:
-            pdf_data = f.read()
-            encoded_file = base64.b64encode(pdf_data).decode()
-            
-            attached_file = Attachment(
-                FileContent(encoded_file),
-                FileName(f'{case_id}_certificate.pdf'),
-                FileType('application/pdf'),
-                Disposition('attachment')
-            )
-            message.attachment = attached_file
+        if pdf_bytes is not None:
+            encoded_file = base64.b64encode(pdf_bytes).decode('ascii')
+        else:
+            with open(pdf_path, 'rb') as f:
+                # Encode straight from the mapped file instead of reading a bytes copy first
+                # (mmap can't map an empty file)
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pdf_data:
+                        encoded_file = base64.b64encode(pdf_data).decode('ascii')
+                else:
+                    encoded_file = ""
         
-        # Send email
-        sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
+        attached_file = Attachment(
+            FileContent(encoded_file),
+            FileName(f'{case_id}_certificate.pdf'),
+            _PDF_FILE_TYPE,
+            _ATTACHMENT_DISPOSITION
+        )
+        message.attachment = attached_file
+        
+        # Send email (same v3 request SendGridAPIClient.send makes, on the pooled session)
+        response = _SESSION.post(
+            _SENDGRID_SEND_URL,
+            json=message.get(),
+            headers={"Authorization": f"Bearer {sendgrid_api_key}"},
+            timeout=30,
+        )
         
         if response.status_code in [200, 201, 202]:
             print(f"Email successfully sent to {to_email}! Status code: {response.status_code}")
             return True
         else:
-            print(f"Failed to send email. Status code: {response.status_code}, Body: {response.body}")
+            print(f"Failed to send email. Status code: {response.status_code}, Body: {response.text}")
+            # Check for common SendGrid errors
+            if "The from address does not match a verified Sender Identity" in response.text:
+                 print(f"HINT: The sender email '{sender_email}' is not verified in SendGrid. Please verify it or update SENDER_EMAIL in .env.")
             return False
         
     except Exception as e:
         print(f"CRITICAL: Email sending exception: {str(e)}")
-        # Check for common SendGrid errors
-        if "The from address does not match a verified Sender Identity" in str(e):
-             print(f"HINT: The sender email '{sender_email}' is not verified in SendGrid. Please verify it or update SENDER_EMAIL in .env.")
         return False
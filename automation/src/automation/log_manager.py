@@ -1,17 +1,124 @@
+import ast
 import asyncio
 import queue
 import json
-from datetime import datetime
-from typing import List, Set
+import re
+import threading
+import time
+import weakref
+from typing import List, Optional, Tuple
+
+# Per-client backlog; a client that falls further behind loses its oldest logs
+CLIENT_QUEUE_SIZE = 256
+
+# Most logs waiting in the pump that are sent together as one SSE event
+MAX_BATCH_SIZE = 32
+
+# Reused encoder (no per-call encoder setup); emojis stay UTF-8 instead of \u escapes
+_encode_json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+# Last formatted "%H:%M:%S" timestamp; logs come in bursts within the same second
+_clock = (0, "")
+
+
+def _timestamp() -> str:
+    """Local wall-clock time as HH:MM:SS, formatted at most once per second."""
+    global _clock
+    second = int(time.time())
+    if _clock[0] != second:
+        _clock = (second, time.strftime("%H:%M:%S", time.localtime(second)))
+    return _clock[1]
+
+
+# Step message per tool, keyed by the @tool names in tools/crewai_tools.py
+_TOOL_STEP_MESSAGES = {
+    "ingest_case": ("📂 Reading & Extracting Case Data...", "step"),
+    "verify_identity": ("🕵️ Verifying Identity against Registry...", "step"),
+    "assess_quality": ("⚖️ Assessing Address Quality...", "step"),
+    "check_business_rules": ("📋 Validating Business Rules...", "step"),
+    "update_registry": ("💾 Committing to City Registry...", "step"),
+    "generate_certificate": ("🖨️ Generating PDF Certificate...", "step"),
+}
+
+
+# Outermost {...} span of a stringified tool result, found in one scan
+_BRACE_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _parse_tool_result(agent_output) -> Optional[dict]:
+    """
+    Return a ToolResult's payload as a dict.
+    
+    Uses the tool's dict output directly when CrewAI hands it over; only the
+    legacy string form is parsed, with json first and literal_eval for the
+    Python-repr dicts that str(model_dump()) produces.
+    """
+    for attr in ("output", "result"):
+        value = getattr(agent_output, attr, None)
+        if isinstance(value, dict):
+            return value
+    
+    text = getattr(agent_output, "result", None)
+    if not isinstance(text, str):
+        text = str(agent_output)
+    match = _BRACE_RE.search(text)
+    if match is None:
+        return None
+    snippet = match.group(0)
+    try:
+        return json.loads(snippet)
+    except ValueError:
+        pass
+    try:
+        data = ast.literal_eval(snippet)
+    except (ValueError, SyntaxError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class _ClientQueue(asyncio.Queue):
+    """Bounded SSE client queue that drops the oldest message when full."""
+    def __init__(self, maxsize: int = CLIENT_QUEUE_SIZE):
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0
+        # Broadcasts in a row that found the queue full (client not reading)
+        self.stalled = 0
+
+    def put_latest(self, item):
+        """Enqueue without waiting; on overflow discard the oldest message."""
+        if self.full():
+            self.get_nowait()
+            self.dropped += 1
+            self.stalled += 1
+        else:
+            self.stalled = 0
+        self.put_nowait(item)
+
+    def close(self):
+        """Discard the backlog and wake the reader with the end-of-stream marker (None)."""
+        while not self.empty():
+            self.get_nowait()
+        self.put_nowait(None)
+
 
 class LogManager:
     _instance = None
     
-    # Queue for receiving logs from sync threads (CrewAI)
+    # Logs recorded before the stream task started (drained once it runs)
     _sync_queue: queue.Queue = queue.Queue()
     
-    # Set of async queues for connected SSE clients
-    _async_queues: Set[asyncio.Queue] = set()
+    # Event loop running stream_logs_to_clients and the queue it awaits;
+    # log() hands payloads over with call_soon_threadsafe, so the task wakes
+    # on each log instead of polling
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _log_queue: Optional[asyncio.Queue] = None
+    _handoff_lock = threading.Lock()
+    
+    # Weak references to connected SSE client queues; an immutable tuple
+    # replaced on connect/disconnect, so each broadcast iterates it without
+    # copying. A queue whose endpoint is gone without calling disconnect()
+    # is garbage collected and its reference removes itself.
+    _async_queues: Tuple["weakref.ref[asyncio.Queue]", ...] = ()
     
     _is_running = False
 
@@ -29,110 +136,120 @@ class LogManager:
     def log(self, message: str, type: str = "info", agent: str = "System"):
         """
         Thread-safe method called by CrewAI agents/tools.
-        Pushes to the sync queue.
+        Hands the log to the stream task's event loop (or buffers it until
+        the task has started).
         """
         payload = {
-            "timestamp": datetime.now().strftime("%H:%M:%S"),
+            "timestamp": _timestamp(),
             "message": message,
             "type": type,
             "agent": agent
         }
-        self._sync_queue.put(payload)
+        with self._handoff_lock:
+            if self._loop is not None:
+                try:
+                    self._loop.call_soon_threadsafe(self._log_queue.put_nowait, payload)
+                    return
+                except RuntimeError:
+                    # Loop closed (shutdown); fall back to the buffer
+                    pass
+            self._sync_queue.put(payload)
 
     async def stream_logs_to_clients(self):
         """
-        Background task: moves logs from sync_queue to all connected async_queues.
+        Background task: moves logs from log() to all connected async_queues.
         """
+        self._log_queue = asyncio.Queue()
+        with self._handoff_lock:
+            # Logs recorded before the task started
+            while True:
+                try:
+                    self._log_queue.put_nowait(self._sync_queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._loop = asyncio.get_running_loop()
+        
         self._is_running = True
         print("🚀 LogManager: Background stream task started")
         
         while self._is_running:
             try:
-                # Non-blocking get from sync queue
-                try:
-                    payload = self._sync_queue.get_nowait()
-                    
-                    # Format as SSE event
-                    sse_message = f"data: {json.dumps(payload)}\n\n"
-                    
-                    # Broadcast to all connected clients
-                    failed_queues = []
-                    for q in list(self._async_queues):
-                        try:
-                            await q.put(sse_message)
-                        except Exception:
+                # Wait for the next log (woken by log(), no polling)
+                batch = [await self._log_queue.get()]
+                # Bursts (tool start + result) go out as one SSE event
+                while len(batch) < MAX_BATCH_SIZE and not self._log_queue.empty():
+                    batch.append(self._log_queue.get_nowait())
+                
+                # Format as SSE event: a single log object, or an array for a burst
+                data = batch[0] if len(batch) == 1 else batch
+                # Encoded to UTF-8 once; every client queue shares the same bytes
+                sse_message = f"data: {_encode_json(data)}\n\n".encode()
+                
+                # Broadcast to all connected clients; puts never wait, so a slow
+                # client can't block the others or buffer without bound
+                failed_queues = []
+                for ref in self._async_queues:
+                    q = ref()
+                    if q is None:
+                        continue
+                    try:
+                        q.put_latest(sse_message)
+                    except Exception:
+                        failed_queues.append(q)
+                    else:
+                        # Hasn't read anything for a whole queue's worth of events
+                        if q.stalled >= q.maxsize:
                             failed_queues.append(q)
-                    
-                    # Cleanup dead queues
-                    for q in failed_queues:
-                        self.disconnect(q)
-                        
-                except queue.Empty:
-                    # Sleep briefly to avoid busy loop
-                    await asyncio.sleep(0.1)
+                
+                # Cleanup dead queues and end their streams
+                for q in failed_queues:
+                    self.disconnect(q)
+                    q.close()
                     
             except Exception as e:
                 print(f"LogManager Error: {e}")
                 await asyncio.sleep(1)
 
     async def connect(self) -> asyncio.Queue:
-        """Create a new async queue for a connecting client."""
-        q = asyncio.Queue()
-        self._async_queues.add(q)
+        """Create a new (bounded) async queue for a connecting client."""
+        q = _ClientQueue()
+        self._async_queues = self._async_queues + (weakref.ref(q, self._forget),)
         
         # Send a welcome packet
-        await q.put(f"data: {json.dumps({'timestamp': datetime.now().strftime('%H:%M:%S'), 'message': 'Connected to Live Brain 🧠', 'type': 'system', 'agent': 'System'})}\n\n")
+        q.put_latest(f"data: {_encode_json({'timestamp': _timestamp(), 'message': 'Connected to Live Brain 🧠', 'type': 'system', 'agent': 'System'})}\n\n".encode())
         
         return q
 
     def disconnect(self, q: asyncio.Queue):
-        if q in self._async_queues:
-            self._async_queues.remove(q)
+        remaining = tuple(ref for ref in self._async_queues if ref() is not q)
+        if len(remaining) != len(self._async_queues):
+            self._async_queues = remaining
+            if getattr(q, "dropped", 0):
+                print(f"LogManager: slow SSE client dropped {q.dropped} log message(s)")
+
+    def _forget(self, ref: "weakref.ref[asyncio.Queue]"):
+        """Weakref callback: drop a collected client queue."""
+        self._async_queues = tuple(x for x in self._async_queues if x is not ref)
 
     def log_agent_step(self, agent_output, agent_name="AI Agent"):
         """
         Parses agent output (AgentAction/ToolResult) and logs data-rich messages.
         Keeps parsing logic out of the main business logic files.
         """
-        import ast
         try:
-            raw_output = str(agent_output)
-
-            # --- HELPER: Parse Dictionary String ---
-            def parse_data(text):
-                try:
-                    start = text.find("{")
-                    end = text.rfind("}")
-                    if start != -1 and end != -1:
-                        dict_str = text[start:end+1]
-                        return ast.literal_eval(dict_str)
-                except:
-                    return None
-                return None
+            output_type = type(agent_output).__name__
 
             # --- 1. HANDLE TOOLS (The "Working" Phase) ---
-            if "AgentAction" in raw_output or (hasattr(agent_output, 'tool') and agent_output.tool):
+            if output_type == "AgentAction" or (hasattr(agent_output, 'tool') and agent_output.tool):
                 tool_name = getattr(agent_output, 'tool', 'Unknown Tool')
                 
-                if 'ingest' in tool_name:
-                    self.log("📂 Reading & Extracting Case Data...", type="step", agent=agent_name)
-                elif 'verify' in tool_name:
-                    self.log("🕵️ Verifying Identity against Registry...", type="step", agent=agent_name)
-                elif 'assess' in tool_name:
-                    self.log("⚖️ Assessing Address Quality...", type="step", agent=agent_name)
-                elif 'business' in tool_name:
-                    self.log("📋 Validating Business Rules...", type="step", agent=agent_name)
-                elif 'registry' in tool_name:
-                    self.log("💾 Committing to City Registry...", type="step", agent=agent_name)
-                elif 'certificate' in tool_name:
-                    self.log("🖨️ Generating PDF Certificate...", type="step", agent=agent_name)
-                else:
-                    self.log(f"🔧 Starting Tool: {tool_name}", type="step", agent=agent_name)
+                message, log_type = _TOOL_STEP_MESSAGES.get(tool_name, (f"🔧 Starting Tool: {tool_name}", "step"))
+                self.log(message, type=log_type, agent=agent_name)
                 return
 
             # --- 2. HANDLE RESULTS (The "Done" Phase) ---
-            if "ToolResult" in raw_output:
-                data = parse_data(raw_output)
+            if output_type == "ToolResult":
+                data = _parse_tool_result(agent_output)
                 
                 if data:
                     # -- SCENARIOS --
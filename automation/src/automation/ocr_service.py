@@ -2,58 +2,171 @@
 OCR Service - Extract text from PDFs using Tesseract and parse with GPT-4
 """
 import os
-import json
-from typing import Dict, List
-from pdf2image import convert_from_path
-import pytesseract
-from openai import OpenAI
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, List, Optional
+from pydantic import BaseModel, field_validator
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+@lru_cache(maxsize=1)
+def _get_client():
+    """OpenAI client, created on first GPT parse (not on import, and never in demo mode)."""
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+
+# Pages OCR'd at the same time (one tesseract process each)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+
+# In-process LRU caches keyed by PDF content hash, so re-submitted or
+# re-processed PDFs skip OCR and the GPT call entirely
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "128"))
+_text_cache: "OrderedDict[str, str]" = OrderedDict()
+_parse_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+FALLBACK_CITIZEN_NAME = "OCR Fallback User"
+
+# Print OCR text and the raw GPT reply for each parse
+OCR_DEBUG = os.getenv("OCR_DEBUG", "false").lower() == "true"
+
+
+class ExtractedCase(BaseModel):
+    """Fields GPT extracts from the two uploaded documents."""
+    citizen_name: Optional[str] = "Unknown"
+    dob: Optional[str] = "Unknown"
+    email: Optional[str] = "Unknown"
+    old_address_raw: Optional[str] = "Unknown"
+    new_address_raw: Optional[str] = "Unknown"
+    move_in_date_raw: Optional[str] = "Unknown"
+    landlord_name: Optional[str] = "Unknown"
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _null_to_unknown(cls, value):
+        """GPT answers null for fields it cannot read; keep the rest of the case."""
+        return "Unknown" if value is None else value
+
+
+def _pdf_digest(pdf_path: str) -> str:
+    """Content hash of a PDF file (BLAKE2b, streamed from disk)."""
+    h = hashlib.blake2b()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_get(cache: OrderedDict, key: str):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key: str, value) -> None:
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > OCR_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _ocr_page(pdf_path: str, page: int) -> str:
     """
-    Convert PDF to images and extract text using Tesseract OCR
+    Rasterize one PDF page and OCR it (English + German).
+    
+    pdftoppm writes the raw PPM page straight into tesseract's stdin, with no
+    PIL image and no temporary PNG in between.
     """
+    raster = subprocess.Popen(
+        ["pdftoppm", "-r", "300", "-f", str(page), "-l", str(page), "-singlefile", pdf_path, "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
     try:
-        # Convert PDF to images
-        images = convert_from_path(pdf_path, dpi=300)
+        # Parallel pages already use every core; keep each tesseract single-threaded
+        # so OpenMP threads don't oversubscribe the CPU
+        ocr = subprocess.run(
+            ["tesseract", "stdin", "stdout", "-l", "eng+deu"],
+            stdin=raster.stdout, capture_output=True,
+            env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+        )
+    finally:
+        raster.stdout.close()
+        raster.wait()
+    if raster.returncode != 0:
+        raise RuntimeError(f"pdftoppm failed on page {page} (exit {raster.returncode})")
+    if ocr.returncode != 0:
+        raise RuntimeError(f"tesseract failed on page {page}: {ocr.stderr.decode(errors='replace').strip()}")
+    return ocr.stdout.decode("utf-8", errors="replace")
+
+
+def _safe_digest(pdf_path: str) -> Optional[str]:
+    """_pdf_digest(), or None (logged) when the PDF cannot be read."""
+    try:
+        return _pdf_digest(pdf_path)
+    except Exception as e:
+        print(f"OCR Error for {pdf_path}: {e}")
+        return None
+
+
+def _extract_text(pdf_path: str, digest: Optional[str]) -> str:
+    """
+    OCR a PDF whose content hash is already known ("" if it was unreadable).
+    
+    Pages are rasterized one at a time inside the OCR workers, so Poppler and
+    Tesseract work on different pages at once and only about OCR_WORKERS page
+    images are in memory, instead of every page of the PDF.
+    """
+    if digest is None:
+        return ""
+    try:
+        cached = _cache_get(_text_cache, digest)
+        if cached is not None:
+            return cached
         
-        # Extract text from each page
-        full_text = ""
-        for i, image in enumerate(images):
-            text = pytesseract.image_to_string(image, lang='eng+deu')  # English + German
-            full_text += f"\n--- Page {i+1} ---\n{text}"
+        from pdf2image import pdfinfo_from_path
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        pages = range(1, page_count + 1)
         
+        # pdftoppm and tesseract are subprocesses, so threads give real CPU parallelism
+        if page_count > 1:
+            with ThreadPoolExecutor(max_workers=min(page_count, OCR_WORKERS)) as executor:
+                texts = list(executor.map(partial(_ocr_page, pdf_path), pages))
+        else:
+            texts = [_ocr_page(pdf_path, page) for page in pages]
+        
+        full_text = "".join(f"\n--- Page {i+1} ---\n{text}" for i, text in enumerate(texts))
+        _cache_put(_text_cache, digest, full_text)
         return full_text
     except Exception as e:
         print(f"OCR Error for {pdf_path}: {e}")
         return ""
 
 
-def parse_ocr_text_with_gpt(landlord_text: str, address_change_text: str, email: str) -> Dict:
+def extract_text_from_pdf(pdf_path: str) -> str:
     """
-    Use GPT-4 to parse OCR text and extract structured data
+    Convert PDF to images and extract text using Tesseract OCR
     """
-    # Debug: Print actual OCR text
-    print("="*80)
-    print("LANDLORD OCR TEXT:")
-    print(landlord_text[:1000])
-    print("="*80)
-    print("ADDRESS CHANGE OCR TEXT:")
-    print(address_change_text[:1000])
-    print("="*80)
-    
-    prompt = f"""
+    return _extract_text(pdf_path, _safe_digest(pdf_path))
+
+
+# Static extraction prompt, filled per call with str.format
+_EXTRACTION_PROMPT = """
 You are a data extraction assistant for German public administration.
 
 I have OCR text from two documents:
 
 **Landlord Confirmation Document:**
-{landlord_text[:2000]}  
+{landlord}  
 
 **Address Change Document:**
-{address_change_text[:2000]}
+{address}
 
 **User Email:** {email}
 
@@ -78,38 +191,48 @@ CRITICAL RULES:
 - If a field is not clearly present, use "Unknown"
 - Return ONLY valid JSON, no markdown, no explanations
 """
+
+
+def parse_ocr_text_with_gpt(landlord_text: str, address_change_text: str, email: str) -> Dict:
+    """
+    Use GPT-4 to parse OCR text and extract structured data
+    """
+    if OCR_DEBUG:
+        print("="*80)
+        print("LANDLORD OCR TEXT:")
+        print(landlord_text[:1000])
+        print("="*80)
+        print("ADDRESS CHANGE OCR TEXT:")
+        print(address_change_text[:1000])
+        print("="*80)
+    
+    prompt = _EXTRACTION_PROMPT.format(
+        landlord=landlord_text[:2000],
+        address=address_change_text[:2000],
+        email=email,
+    )
     
     try:
-        response = client.chat.completions.create(
+        response = _get_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a precise data extraction assistant. Extract EXACTLY what you see, do not expand abbreviations. Return only valid JSON."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0,  # Changed from 0.1 to 0.0 for more literal extraction
-            max_tokens=500
+            max_tokens=500,
+            # JSON mode: the reply is always one bare JSON object (no markdown fences)
+            response_format={"type": "json_object"}
         )
         
-        result_text = response.choices[0].message.content.strip()
-        
-        # Debug: Print GPT response
-        print("GPT RESPONSE:")
-        print(result_text)
-        print("="*80)
-        
-        # Remove markdown code blocks if present
-        if result_text.startswith("```json"):
-            result_text = result_text[7:]
-        if result_text.startswith("```"):
-            result_text = result_text[3:]
-        if result_text.endswith("```"):
-            result_text = result_text[:-3]
+        result_text = response.choices[0].message.content
         
-        result_text = result_text.strip()
+        if OCR_DEBUG:
+            print("GPT RESPONSE:")
+            print(result_text)
+            print("="*80)
         
-        # Parse JSON
-        data = json.loads(result_text)
-        return data
+        return ExtractedCase.model_validate_json(result_text).model_dump()
         
     except Exception as e:
         print(f"GPT Parsing Error: {e}")
@@ -117,7 +240,7 @@ CRITICAL RULES:
         traceback.print_exc()
         # Return fallback data with VALID database values
         return {
-            "citizen_name": "OCR Fallback User",
+            "citizen_name": FALLBACK_CITIZEN_NAME,
             "dob": "1990-01-01",  # Valid date format
             "email": email,
             "old_address_raw": "Fallback Old Street 1, 10115 Berlin",
@@ -147,8 +270,22 @@ def process_uploaded_pdfs(landlord_pdf_path: str, address_pdf_path: str, email:
                 "landlord_name": "Demo Landlord Properties GmbH"}
     else:
         # Real OCR processing
+        # Each PDF is hashed once: the digests key both the parse and the text cache
+        landlord_digest = _safe_digest(landlord_pdf_path)
+        address_digest = _safe_digest(address_pdf_path)
+        key = None
+        if landlord_digest and address_digest:
+            key = "|".join((landlord_digest, address_digest, email))
+            cached = _cache_get(_parse_cache, key)
+            if cached is not None:
+                print("Using cached OCR result for identical PDFs")
+                return dict(cached)
+        
         print("Running real OCR for uploaded PDFs...")
-        landlord_text = extract_text_from_pdf(landlord_pdf_path)
-        address_text = extract_text_from_pdf(address_pdf_path)
+        landlord_text = _extract_text(landlord_pdf_path, landlord_digest)
+        address_text = _extract_text(address_pdf_path, address_digest)
         structured_data = parse_ocr_text_with_gpt(landlord_text, address_text, email)
+        # Don't pin a failed GPT parse; the next attempt may succeed
+        if key and structured_data.get("citizen_name") != FALLBACK_CITIZEN_NAME:
+            _cache_put(_parse_cache, key, dict(structured_data))
         return structured_data